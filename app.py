@@ -6,6 +6,7 @@ from src.optimizing.optimize import optimize
 import os
 from src.common import *
 from src.helpers.helper import optimize_fraud_pair_indexing, index_to_filepath
+from src.helpers.profiling import profiler
 import time
 import csv
 
@@ -20,18 +21,25 @@ def pipeline(call_idx):
     if FRESH_RUN:
         remove_generated_files()
 
+    # Measure the stages of this run from scratch
+    profiler.reset()
+
     fraud_pairs = None
 
     # Get the data from the correct dataset
-    if WIKIPEDIA_DATA:
-        fraud_pairs = wikipedia_extraction.initiate_dataset_extraction()
-    else:
-        fraud_pairs = corpus_extraction.initiate_dataset_extraction()
+    with profiler.stage("read") as measurement:
+        if WIKIPEDIA_DATA:
+            fraud_pairs = wikipedia_extraction.initiate_dataset_extraction()
+        else:
+            fraud_pairs = corpus_extraction.initiate_dataset_extraction()
+        dataset_file_paths = [
+            f"{DATASET_DIR}{file}" for file in os.listdir(DATASET_DIR)
+        ]
+        measurement["items"] = len(dataset_file_paths)
 
     # Preprocessing the documents
-    documents, file_paths = initiate_preprocessing(
-        file_paths=[f"{DATASET_DIR}{file}" for file in os.listdir(DATASET_DIR)]
-    )
+    with profiler.stage("preprocess", items=len(dataset_file_paths)):
+        documents, file_paths = initiate_preprocessing(file_paths=dataset_file_paths)
 
     # Link the fraud pairs to the indexes of the document list
     fraud_pairs_indexed = optimize_fraud_pair_indexing(fraud_pairs, file_paths)
@@ -40,12 +48,13 @@ def pipeline(call_idx):
     start_time = time.time()
 
     ## Hyperparameter tuning
-    optimal_hyperparams, best_f1 = optimize(
-        documents,
-        n_iter=OPTIMISATION_ITER_COUNT,
-        fraud_pairs=fraud_pairs_indexed,
-        file_paths=file_paths,
-    )
+    with profiler.stage("optimize", items=OPTIMISATION_ITER_COUNT):
+        optimal_hyperparams, best_f1 = optimize(
+            documents,
+            n_iter=OPTIMISATION_ITER_COUNT,
+            fraud_pairs=fraud_pairs_indexed,
+            file_paths=file_paths,
+        )
     # Calculate the time taken for optimization
     optimize_time = time.time() - start_time
 
@@ -55,7 +64,14 @@ def pipeline(call_idx):
     # Time the duration of LSH
     start_lsh_time = time.time()
     # Make the model predict the candidate pairs from the documents
-    candidate_pairs = optimal_model.predict(documents, file_paths)
+    if STREAMING_PIPELINE:
+        # Read the documents from disk in chunks instead of keeping the whole corpus in memory
+        del documents
+        candidate_pairs = optimal_model.predict_stream(file_paths)
+    else:
+        candidate_pairs = optimal_model.predict(
+            documents, file_paths, n_jobs=AMOUNT_OF_WORKERS
+        )
 
     # Calculate the time taken for LSH
     lsh_time = time.time() - start_lsh_time
@@ -65,6 +81,9 @@ def pipeline(call_idx):
         print(f"Similar files: {pair} \n")
     debug_print(f"Fraud pairs: {index_to_filepath(fraud_pairs_indexed, file_paths)}")
 
+    # Write the measurements of the stages to the evaluation directory of this instance and to {PROFILE_CSV}
+    profiler.save(EVALUATION_DIR[0], PROFILE_CSV, run_name=f"instance-{call_idx}")
+
     return [optimize_time, lsh_time, best_f1]
 
 
@@ -0,0 +1,287 @@
+import os
+import sys
+import json
+import argparse
+import functools
+import platform
+import tracemalloc
+import numpy as np
+from src.LSH.shingle import (
+    word_based_shingle,
+    character_based_shingle,
+    word_based_hashed_shingle,
+)
+from src.LSH.minhash import compute_signature_matrix
+from src.LSH.lsh import lsh
+from src.LSH.hashing import Hashing
+from src.helpers.helper import encode_pairs
+from src.helpers.profiling import Profiler
+
+## Benchmarks of the shingling, MinHash and banding steps of the LSH engine on seeded synthetic corpora.
+## The corpora do not depend on the datasets, so results of different runs (and commits) can be compared.
+## Run from the root of the repository: python -m benchmarks.run_benchmarks --sizes 1000 10000
+
+BASELINE_FILE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+BENCHMARK_SEED = 42
+# Also supported: 100_000 and 1_000_000. With N_BANDS bands of K buckets, 1M documents put about ten unrelated documents
+# in every bucket of every band, so the banding step emits ~10^8 candidate pairs and needs well over 5 GB of memory.
+SIZES = [1_000, 10_000]
+# The vocabulary-based shinglers loop over every shingle in Python, these are skipped for larger corpora
+MAX_VOCABULARY_SHINGLE_SIZE = 10_000
+
+# Parameters of the synthetic corpus
+VOCABULARY_SIZE = 20_000
+DOCUMENT_LENGTH = 60  # Words per document
+# Fraction of the documents which is a near-duplicate of another document
+NEAR_DUPLICATE_RATIO = 0.1
+# Fraction of the words of a near-duplicate which is replaced by a random word
+EDIT_RATIO = 0.1
+
+# Parameters of the LSH engine
+SHINGLE_SIZE = 3
+N_HASH = 100
+N_BANDS = 25
+K = 100_000
+
+# A step is a regression if it takes more than (1 + REGRESSION_TOLERANCE) times the wall time of the baseline,
+# and at least MIN_REGRESSION_TIME seconds longer (very short steps are too noisy to compare)
+REGRESSION_TOLERANCE = 0.2
+MIN_REGRESSION_TIME = 0.05
+
+
+# Create a seeded synthetic corpus of {nr_docs} documents. The words are drawn from a Zipf-like distribution over the
+# vocabulary, and {near_duplicate_ratio} of the documents are copies of an earlier document with {edit_ratio} of the words replaced.
+# @return the documents and the pairs (original, near-duplicate) of injected near-duplicates as an (n, 2) int64 array
+def generate_corpus(
+    nr_docs,
+    seed=BENCHMARK_SEED,
+    vocabulary_size=VOCABULARY_SIZE,
+    document_length=DOCUMENT_LENGTH,
+    near_duplicate_ratio=NEAR_DUPLICATE_RATIO,
+    edit_ratio=EDIT_RATIO,
+):
+    rng = np.random.default_rng(seed)
+    vocabulary = np.array([f"w{idx}" for idx in range(vocabulary_size)])
+    word_probabilities = 1 / np.arange(1, vocabulary_size + 1)
+    word_probabilities /= word_probabilities.sum()
+
+    words = rng.choice(
+        vocabulary_size, size=(nr_docs, document_length), p=word_probabilities
+    )
+
+    # Every near-duplicate copies a document with a lower index, which is not a near-duplicate itself
+    nr_near_duplicates = int(nr_docs * near_duplicate_ratio)
+    near_duplicates = np.sort(
+        rng.choice(np.arange(1, nr_docs), nr_near_duplicates, replace=False)
+    )
+    is_near_duplicate = np.zeros(nr_docs, dtype=bool)
+    is_near_duplicate[near_duplicates] = True
+
+    # Pick the original of every near-duplicate among the documents before it which are not near-duplicates themselves
+    originals = np.flatnonzero(~is_near_duplicate)
+    nr_candidates = np.searchsorted(originals, near_duplicates)
+    original_indices = originals[
+        (rng.random(nr_near_duplicates) * nr_candidates).astype(np.int64)
+    ]
+
+    # Copy the originals and replace a part of their words
+    words[near_duplicates] = words[original_indices]
+    edits = rng.random((nr_near_duplicates, document_length)) < edit_ratio
+    words[near_duplicates] = np.where(
+        edits,
+        rng.integers(0, vocabulary_size, (nr_near_duplicates, document_length)),
+        words[near_duplicates],
+    )
+    pairs = np.stack((original_indices, near_duplicates), axis=1)
+
+    documents = [" ".join(vocabulary[document]) for document in words]
+    return documents, pairs.astype(np.int64)
+
+
+# Run {function} with the keyword arguments {kwargs} as step {name} of the benchmark on {nr_docs} documents, timed by {profiler}.
+# If {measure_memory} is set, the step is first run with tracemalloc to measure the peak memory it allocates on top of the
+# memory in use when it starts (numpy arrays are traced as well). Tracing slows down the step, so the result of that run
+# is discarded and the step is timed in a second run without tracing.
+# @return the result of {function}, the peak memory is stored with the measurements of the step (None if not measured)
+def run_step(profiler, name, nr_docs, measure_memory, function, **kwargs):
+    peak_memory_mb = None
+    if measure_memory:
+        tracemalloc.start()
+        function(**kwargs)
+        peak_memory_mb = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        tracemalloc.stop()
+
+    with profiler.stage(name, items=nr_docs):
+        result = function(**kwargs)
+    profiler.stages[name]["peak_memory_mb"] = peak_memory_mb
+    return result
+
+
+# Benchmark the steps of the engine on a corpus of {nr_docs} documents
+# @return a dictionary with the measurements of every step, and the recall of the injected near-duplicates
+def benchmark_size(nr_docs, measure_memory=True):
+    documents, near_duplicate_pairs = generate_corpus(nr_docs)
+    hashing = Hashing(n_hash=N_HASH, n_bands=N_BANDS, K=K)
+    profiler = Profiler(hot_paths=False)
+    step = functools.partial(
+        run_step, profiler, nr_docs=nr_docs, measure_memory=measure_memory
+    )
+
+    if nr_docs <= MAX_VOCABULARY_SHINGLE_SIZE:
+        vocabulary_shingles = step(
+            "word_based_shingle",
+            function=word_based_shingle,
+            documents=documents,
+            shingle_size=SHINGLE_SIZE,
+        )
+        # MinHash on the vocabulary indexes, which is the default (non-hashed) shingling mode of the engine
+        step(
+            "compute_signature_matrix_vocabulary",
+            function=compute_signature_matrix,
+            shingles=vocabulary_shingles,
+            hashing=hashing,
+        )
+        del vocabulary_shingles
+        step(
+            "character_based_shingle",
+            function=character_based_shingle,
+            documents=documents,
+            shingle_size=SHINGLE_SIZE,
+        )
+
+    # The hashed shingles are used for MinHash at every size, as they do not need a global vocabulary
+    shingles = step(
+        "word_based_hashed_shingle",
+        function=word_based_hashed_shingle,
+        documents=documents,
+        shingle_size=SHINGLE_SIZE,
+    )
+    del documents
+
+    signature_matrix = step(
+        "compute_signature_matrix",
+        function=compute_signature_matrix,
+        shingles=shingles,
+        hashing=hashing,
+    )
+    del shingles
+
+    candidate_pairs = step("lsh", function=lsh, sig=signature_matrix, hashing=hashing)
+
+    found = np.isin(
+        encode_pairs(near_duplicate_pairs, nr_docs),
+        encode_pairs(candidate_pairs, nr_docs),
+    )
+    return {
+        "steps": profiler.report()["stages"],
+        "candidate_pairs": len(candidate_pairs),
+        "near_duplicate_recall": float(found.mean()) if len(found) else None,
+    }
+
+
+# Compare the results with the baseline
+# @return a list with a description of every step which is slower than the baseline
+def compare_with_baseline(results, baseline, tolerance=REGRESSION_TOLERANCE):
+    regressions = []
+    for size, result in results.items():
+        baseline_steps = baseline.get("sizes", {}).get(size, {}).get("steps", {})
+        for step, measurements in result["steps"].items():
+            if step not in baseline_steps:
+                continue
+            baseline_time = baseline_steps[step]["wall_time"]
+            ratio = measurements["wall_time"] / baseline_time
+            print(
+                f"{size:>9} docs  {step:<36} {measurements['wall_time']:9.3f} s  ({ratio:5.2f}x baseline)"
+            )
+            if (
+                ratio > 1 + tolerance
+                and measurements["wall_time"] - baseline_time > MIN_REGRESSION_TIME
+            ):
+                regressions.append(
+                    f"{step} on {size} documents: {measurements['wall_time']:.3f} s vs {baseline_time:.3f} s"
+                )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark shingling, MinHash and banding on synthetic corpora"
+    )
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=SIZES, help="Numbers of documents"
+    )
+    parser.add_argument(
+        "--baseline", default=BASELINE_FILE, help="Baseline file to compare with"
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="Write the results to the baseline file instead of comparing with it",
+    )
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    parser.add_argument(
+        "--no-memory",
+        action="store_true",
+        help="Do not measure the peak memory of the steps, which runs every step twice",
+    )
+    args = parser.parse_args(argv)
+
+    results = {}
+    for nr_docs in args.sizes:
+        print(f"Benchmarking {nr_docs} documents...")
+        results[str(nr_docs)] = benchmark_size(
+            nr_docs, measure_memory=not args.no_memory
+        )
+        for step, measurements in results[str(nr_docs)]["steps"].items():
+            print(
+                f"  {step:<36} {measurements['wall_time']:9.3f} s  {measurements['items_per_second']:12.0f} docs/s  "
+                f"peak memory {measurements['peak_memory_mb'] or 0:.1f} MB"
+            )
+        print(
+            f"  {results[str(nr_docs)]['candidate_pairs']} candidate pairs, "
+            f"near-duplicate recall {results[str(nr_docs)]['near_duplicate_recall']}"
+        )
+
+    report = {
+        "machine": {
+            "platform": platform.platform(),
+            "processor": platform.processor(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+        },
+        "sizes": results,
+    }
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=4)
+
+    if args.update_baseline:
+        # Keep the baseline of the sizes which were not run
+        if os.path.exists(args.baseline):
+            with open(args.baseline, "r", encoding="utf-8") as file:
+                baseline = json.load(file)
+            baseline["sizes"].update(results)
+            baseline["machine"] = report["machine"]
+            report = baseline
+        with open(args.baseline, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=4)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline found at {args.baseline}, run with --update-baseline")
+        return 0
+
+    with open(args.baseline, "r", encoding="utf-8") as file:
+        baseline = json.load(file)
+    print(f"Comparing with the baseline of {baseline['machine']['platform']}:")
+    regressions = compare_with_baseline(results, baseline)
+    for regression in regressions:
+        print(f"REGRESSION: {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
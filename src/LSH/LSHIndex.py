@@ -0,0 +1,171 @@
+import os
+import pickle
+import numpy as np
+from src.LSH.shingle import word_based_hashed_shingle, character_based_hashed_shingle
+from src.LSH.minhash import compute_signature_matrix
+from src.LSH.hashing import Hashing
+from src.LSH.signature_store import SignatureStore
+from src.constants import WORD_BASED, RANDOM_SEED
+
+INDEX_FILE = "index.pkl"
+
+
+# Persistent LSH index. Documents are added once, after which new documents can be checked against the index
+# without reprocessing the indexed corpus. The index keeps the signature of every document and, for every band,
+# a bucket table which maps the hash of the band to the documents in that bucket.
+# Shingles are hashed to ids (see word_based_hashed_shingle), so that ids are stable between calls to add and query.
+class LSHIndex:
+    def __init__(
+        self,
+        shingle_size: int,
+        n_hash: int,
+        n_bands: int,
+        K: int,
+        window_step: int = 1,
+        word_based: bool = None,
+        seed=RANDOM_SEED,
+    ):
+        self.shingle_size = shingle_size
+        self.window_step = window_step
+        self.word_based = WORD_BASED[0] if word_based is None else word_based
+        self.hashing = Hashing(n_hash=n_hash, n_bands=n_bands, K=K, seed=seed)
+
+        # Identifier (e.g. file path) of every indexed document, the position in this list is the document index
+        self.document_ids = []
+        # One bucket table per band: band hash -> list of document indices
+        self.buckets = [dict() for _ in range(n_bands)]
+        # Signatures of the documents which are not in the store yet (all documents until the index is saved),
+        # the dimensions are n_hash x number of documents
+        self.unsaved_signatures = np.empty((n_hash, 0), dtype=np.uint32)
+        # On-disk store of the signatures of the first store.num_documents documents, set once the index is saved or loaded
+        self.store = None
+
+    def __len__(self):
+        return len(self.document_ids)
+
+    # Add documents to the index. If no identifiers are given, the document indices are used
+    # @return the indices of the added documents
+    def add(self, documents, document_ids=None):
+        documents = list(documents)
+        first_idx = len(self.document_ids)
+        if document_ids is None:
+            document_ids = range(first_idx, first_idx + len(documents))
+        document_ids = list(document_ids)
+        assert len(document_ids) == len(
+            documents
+        ), "Each document needs exactly one identifier"
+
+        signatures = self.compute_signatures(documents)
+
+        # Add the documents to the bucket of each band
+        for i, band_hashes in enumerate(self.band_hashes(signatures)):
+            bucket_table = self.buckets[i]
+            for doc_idx, band_hash in enumerate(band_hashes, start=first_idx):
+                bucket_table.setdefault(band_hash, []).append(doc_idx)
+
+        # New signatures are kept in memory until save() writes them to the store together with the bucket tables,
+        # so the store never holds signatures of documents that the saved bucket tables do not know about
+        self.unsaved_signatures = np.concatenate(
+            (self.unsaved_signatures, signatures), axis=1
+        )
+        self.document_ids.extend(document_ids)
+
+        return list(range(first_idx, len(self.document_ids)))
+
+    # Signature matrix of the indexed documents, the dimensions are n_hash x number of documents.
+    # If all signatures are in the store, this is a memory map of the store; otherwise the signatures are read into memory.
+    @property
+    def signatures(self):
+        if self.store is None:
+            return self.unsaved_signatures
+        if self.unsaved_signatures.shape[1] == 0:
+            return self.store.signatures()
+        return np.concatenate(
+            (self.store.signatures(), self.unsaved_signatures), axis=1
+        )
+
+    # Find the indexed documents which share a bucket with {document} in at least one band.
+    # Only the buckets of the document are visited, so the cost depends on the bucket sizes and not on the size of the index.
+    # @return the identifiers of the candidate documents, in the order they were added
+    def query(self, document):
+        signature = self.compute_signatures([document])
+
+        candidates = set()
+        for i, band_hashes in enumerate(self.band_hashes(signature)):
+            candidates.update(self.buckets[i].get(band_hashes[0], ()))
+
+        return [self.document_ids[doc_idx] for doc_idx in sorted(candidates)]
+
+    # Shingle the documents and compute their signatures with the hashing of the index
+    # @return the signature matrix of the documents
+    def compute_signatures(self, documents):
+        shingle = (
+            word_based_hashed_shingle
+            if self.word_based
+            else character_based_hashed_shingle
+        )
+        shingles = shingle(
+            documents=documents,
+            shingle_size=self.shingle_size,
+            window_step=self.window_step,
+        )
+        return compute_signature_matrix(shingles=shingles, hashing=self.hashing)
+
+    # Compute the bucket keys of every band of the signatures in the same way as lsh() does
+    # @return a generator with, for each band, a list with the (hashable) key of every document
+    def band_hashes(self, signatures):
+        r = self.hashing.n_hash // self.hashing.n_bands
+        for i in range(self.hashing.n_bands):
+            yield self.hashing.band_keys(signatures[i * r : (i + 1) * r, :], i).tolist()
+
+    # Save the index to the directory {path}. The signatures are written to a SignatureStore next to the bucket tables,
+    # after which the index reads its saved signatures from (and appends the signatures of new documents to) that store.
+    # The store is written before the bucket tables, so if the process stops in between, the store holds more documents
+    # than the saved index, which load() repairs by truncating the store.
+    def save(self, path):
+        path = os.path.abspath(path)
+        if self.store is None or os.path.abspath(self.store.path) != path:
+            store = SignatureStore.create(
+                path,
+                self.hashing,
+                shingle_size=self.shingle_size,
+                window_step=self.window_step,
+                word_based=self.word_based,
+                hashed_shingles=True,
+                capacity=len(self.document_ids),
+            )
+            if self.store is not None:
+                store.append(np.asarray(self.store.signatures()))
+            self.store = store
+
+        self.store.append(self.unsaved_signatures)
+        self.unsaved_signatures = np.empty((self.hashing.n_hash, 0), dtype=np.uint32)
+
+        state = self.__dict__.copy()
+        del state["unsaved_signatures"]
+        del state["store"]
+        # Write to a temporary file first, so the index file is never half-written
+        file_path = os.path.join(path, INDEX_FILE)
+        with open(f"{file_path}.tmp", "wb") as file:
+            pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f"{file_path}.tmp", file_path)
+
+    # Load an index which was saved with save(), the signatures are memory mapped and not read into memory
+    # @return the loaded index
+    @classmethod
+    def load(cls, path):
+        index = cls.__new__(cls)
+        with open(os.path.join(path, INDEX_FILE), "rb") as file:
+            index.__dict__.update(pickle.load(file))
+        index.unsaved_signatures = np.empty((index.hashing.n_hash, 0), dtype=np.uint32)
+        index.store = SignatureStore.open(path)
+
+        # Signatures which were stored after the index file was last written belong to documents the index does not know
+        if index.store.num_documents > len(index.document_ids):
+            index.store.truncate(len(index.document_ids))
+        elif index.store.num_documents < len(index.document_ids):
+            raise ValueError(
+                f"The signature store in {path} holds {index.store.num_documents} documents, "
+                f"but the index has {len(index.document_ids)} documents"
+            )
+        return index
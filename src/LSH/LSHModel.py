@@ -1,10 +1,44 @@
 from sklearn.base import BaseEstimator
-from src.LSH.shingle import word_based_shingle, character_based_shingle
-from src.LSH.minhash import compute_signature_matrix
+from src.LSH.shingle import (
+    shingle_documents,
+    word_based_hashed_shingle,
+    character_based_hashed_shingle,
+)
+from src.LSH.minhash import (
+    compute_signature_matrix,
+    compute_signature_matrix_parallel,
+    compute_document_signatures_parallel,
+)
 from src.LSH.lsh import lsh
-from src.constants import N_HASH, N_BANDS, K, SHINGLE_SIZE, WINDOW_STEP, WORD_BASED
+from src.LSH.similarity import verify_candidates, pairs_to_records
+from src.constants import (
+    N_HASH,
+    N_BANDS,
+    K,
+    SHINGLE_SIZE,
+    WINDOW_STEP,
+    WORD_BASED,
+    HASHED_SHINGLES,
+    NESTED_HASHING,
+    VERIFICATION_THRESHOLD,
+    VERIFICATION_METHOD,
+    STREAM_CHUNK_SIZE,
+    SIGNATURE_STORE_DIR,
+)
 from src.LSH.hashing import Hashing
-from src.helpers.helper import filter_pairs_by_number, index_to_filepath
+from src.LSH.cache import signature_cache, corpus_fingerprint
+from src.LSH.signature_store import SignatureStore
+from src.common import read_from_file_paths
+from src.helpers.helper import (
+    filter_pairs_by_number,
+    index_to_filepath,
+    document_metadata,
+    map_to_original_pairs,
+    to_pair_array,
+    encode_pairs,
+)
+from src.helpers.profiling import profiler
+import numpy as np
 import gc
 
 
@@ -17,40 +51,118 @@ class LSHModel(BaseEstimator):
         n_bands=N_BANDS,
         K=K,
         n_hash=N_HASH,
+        verification_threshold=VERIFICATION_THRESHOLD,
+        verification_method=VERIFICATION_METHOD,
     ):
         self.shingle_size = shingle_size
         self.window_step = window_step
         self.K = K
-        self.hashing = Hashing(n_hash=n_hash, n_bands=n_bands, K=K)
+        self.verification_threshold = verification_threshold
+        self.verification_method = verification_method
+        self.hashing = Hashing(
+            n_hash=n_hash, n_bands=n_bands, K=K, nested=NESTED_HASHING[0]
+        )
 
     # Given a set of documents, predict the similar documents
+    # The signatures are computed with {n_jobs} worker processes, the result does not depend on the number of workers.
+    # The {metadata} of the documents (see document_metadata) is built from {file_paths} if it is not given.
     # @return the pairs of similar documents
-    def predict(self, X, file_paths=None, optimization=False):
-        shingles = None
-        # Compute shingles with the correct shingling operation, depending on whether we want to operate with word- or character-shingles.
-        if WORD_BASED[0]:
-            shingles = word_based_shingle(documents=X, shingle_size=self.shingle_size)
-        else:
-            shingles = character_based_shingle(
-                documents=X, shingle_size=self.shingle_size
-            )
+    def predict(self, X, file_paths=None, optimization=False, n_jobs=1, metadata=None):
+        records = self.candidates(
+            X, threshold=self.verification_threshold, n_jobs=n_jobs
+        )
+        candidate_pairs = np.stack((records["doc_a"], records["doc_b"]), axis=1)
 
         del X
-        # Compute signature matrix
-        signature_matrix = compute_signature_matrix(
-            shingles=shingles, hashing=self.hashing
+        del records
+
+        return self.filter_candidates(
+            candidate_pairs, file_paths, optimization, metadata=metadata
         )
 
-        del shingles
-        # Apply LSH algorithm
-        candidate_pairs = lsh(sig=signature_matrix, hashing=self.hashing)
+    # Predict the similar documents of a corpus which is read from {file_paths} in chunks of {chunk_size} documents.
+    # Each chunk is shingled and MinHashed, after which its signatures are appended to a SignatureStore in {store_path}.
+    # LSH then runs on the memory-mapped signatures, so the peak memory is bounded by the chunk size and not by the corpus.
+    # The shingles are always hashed to ids (see word_based_hashed_shingle), as there is no global vocabulary of shingles.
+    # @return the pairs of similar documents
+    def predict_stream(
+        self,
+        file_paths,
+        chunk_size=STREAM_CHUNK_SIZE,
+        store_path=SIGNATURE_STORE_DIR,
+        optimization=False,
+    ):
+        if (
+            self.verification_threshold is not None
+            and self.verification_method == "exact"
+        ):
+            raise ValueError(
+                "Exact verification needs the shingles of all documents, use the estimated verification method"
+            )
+
+        store = SignatureStore.create(
+            store_path,
+            self.hashing,
+            shingle_size=self.shingle_size,
+            window_step=self.window_step,
+            word_based=WORD_BASED[0],
+            hashed_shingles=True,
+            capacity=len(file_paths),
+        )
+        shingle = (
+            word_based_hashed_shingle
+            if WORD_BASED[0]
+            else character_based_hashed_shingle
+        )
+
+        for start in range(0, len(file_paths), chunk_size):
+            chunk_file_paths = file_paths[start : start + chunk_size]
+            with profiler.stage("read", items=len(chunk_file_paths)):
+                documents = read_from_file_paths(chunk_file_paths)
+            with profiler.stage("shingle", items=len(documents)):
+                shingles = shingle(
+                    documents=documents,
+                    shingle_size=self.shingle_size,
+                    window_step=self.window_step,
+                )
+            with profiler.stage("minhash", items=len(documents)):
+                store.append(
+                    compute_signature_matrix(shingles=shingles, hashing=self.hashing)
+                )
+
+            del documents
+            del shingles
+            gc.collect()
+
+        # Apply LSH algorithm on the signatures on disk
+        signature_matrix = store.signatures()
+        with profiler.stage("band", items=signature_matrix.shape[1]):
+            candidate_pairs = lsh(sig=signature_matrix, hashing=self.hashing)
+
+        # Verify the candidates with their estimated similarity
+        if self.verification_threshold is not None:
+            records = verify_candidates(
+                candidate_pairs,
+                self.verification_threshold,
+                signatures=signature_matrix,
+                method=self.verification_method,
+            )
+            candidate_pairs = np.stack((records["doc_a"], records["doc_b"]), axis=1)
 
         del signature_matrix
-        del self
 
-        # Filter out pairs where both elements represent the same file.
-        # This means we do not allow files to be compared with themselves or (paraphrased) versions of themselves
-        candidate_pairs = filter_pairs_by_number(candidate_pairs, file_paths)
+        return self.filter_candidates(candidate_pairs, file_paths, optimization)
+
+    # Filter out pairs where both elements represent the same file.
+    # This means we do not allow files to be compared with themselves or (paraphrased) versions of themselves
+    # @return the filtered pairs, as an (n, 2) array of indices if {optimization} is True and as file paths otherwise
+    def filter_candidates(
+        self, candidate_pairs, file_paths, optimization=False, metadata=None
+    ):
+        with profiler.stage("filter", items=len(candidate_pairs)):
+            candidate_pairs = filter_pairs_by_number(
+                candidate_pairs, file_paths, metadata=metadata
+            )
 
         # If we are not optimizing (aka making final prediction), convert the indices in the candidate pairs to file paths for readability
         if not optimization:
@@ -61,20 +173,151 @@ class LSHModel(BaseEstimator):
 
         return candidate_pairs
 
+    # Given a set of documents, predict the similar documents together with their (estimated or exact) Jaccard similarity.
+    # Pairs with a paraphrased file are reported as a pair with the original file, with the highest similarity of its versions.
+    # @return a list of (file path, file path, similarity) tuples, from the most to the least similar pair
+    def predict_with_scores(self, X, file_paths, n_jobs=1):
+        threshold = self.verification_threshold or 0
+        records = self.candidates(X, threshold=threshold, n_jobs=n_jobs)
+
+        # Apply the same filtering and mapping to the original files as predict does
+        keep, original_pairs = map_to_original_pairs(
+            np.stack((records["doc_a"], records["doc_b"]), axis=1),
+            document_metadata(file_paths),
+        )
+
+        scores = {}
+        for pair, score in zip(
+            map(tuple, original_pairs.tolist()), records["score"][keep].tolist()
+        ):
+            scores[pair] = max(score, scores.get(pair, score))
+
+        return sorted(
+            [
+                (file_paths[pair[0]], file_paths[pair[1]], score)
+                for pair, score in scores.items()
+            ],
+            key=lambda record: record[2],
+            reverse=True,
+        )
+
+    # Find the candidate pairs of the documents with LSH. If a {threshold} is given, the candidates are verified:
+    # pairs with an (estimated or exact, see {verification_method}) Jaccard similarity below the threshold are dropped.
+    # The signatures are computed by {n_jobs} worker processes, each handling a shard of the documents, and the bands by {n_jobs} threads.
+    # @return the candidate pairs as records (doc_a, doc_b, score), the score is NaN if the candidates are not verified
+    def candidates(self, X, threshold=None, n_jobs=1):
+        # Shingles and signatures only depend on the corpus and the shingle/hashing parameters, not on n_bands or K.
+        # They are cached, so models which only differ in their banding parameters reuse them.
+        shingle_key = (
+            corpus_fingerprint(X),
+            self.shingle_size,
+            self.window_step,
+            WORD_BASED[0],
+            HASHED_SHINGLES[0],
+        )
+        # With nested hashing, the signature for the largest n_hash is computed (and cached) and its first n_hash rows are used
+        signature_hashing = self.hashing
+        if self.hashing.nested:
+            signature_hashing = Hashing(
+                n_hash=max(N_HASH + [self.hashing.n_hash]),
+                seed=self.hashing.seed,
+                nested=True,
+            )
+        signature_key = shingle_key + (
+            signature_hashing.seed,
+            signature_hashing.n_hash,
+            signature_hashing.nested,
+        )
+
+        def compute_shingles():
+            with profiler.stage("shingle", items=len(X)):
+                return self.shingle(X)
+
+        def get_shingles():
+            return signature_cache.get_or_compute(
+                ("shingles",) + shingle_key, compute_shingles
+            )
+
+        signature_matrix = signature_cache.get(("signatures",) + signature_key)
+        if signature_matrix is None and n_jobs > 1 and HASHED_SHINGLES[0]:
+            # Hashed shingle ids do not depend on the other documents, so each worker shingles and MinHashes its own shard
+            with profiler.stage("minhash", items=len(X)):
+                signature_matrix = compute_document_signatures_parallel(
+                    X,
+                    hashing=signature_hashing,
+                    shingle_size=self.shingle_size,
+                    n_jobs=n_jobs,
+                    window_step=self.window_step,
+                    word_based=WORD_BASED[0],
+                    hashed_shingles=HASHED_SHINGLES[0],
+                )
+            signature_cache.put(("signatures",) + signature_key, signature_matrix)
+        elif signature_matrix is None:
+            shingles = get_shingles()
+
+            # Compute signature matrix, in parallel over shards of the documents if n_jobs > 1
+            with profiler.stage("minhash", items=len(X)):
+                if n_jobs > 1:
+                    signature_matrix = compute_signature_matrix_parallel(
+                        shingles=shingles, hashing=signature_hashing, n_jobs=n_jobs
+                    )
+                else:
+                    signature_matrix = compute_signature_matrix(
+                        shingles=shingles, hashing=signature_hashing
+                    )
+            signature_cache.put(("signatures",) + signature_key, signature_matrix)
+
+            del shingles
+
+        signature_matrix = signature_matrix[: self.hashing.n_hash]
+        # Apply LSH algorithm
+        with profiler.stage("band", items=len(X)):
+            candidate_pairs = lsh(
+                sig=signature_matrix, hashing=self.hashing, n_jobs=n_jobs
+            )
+
+        if threshold is None:
+            return pairs_to_records(candidate_pairs)
+
+        # Verify the candidates with their similarity
+        shingles = get_shingles() if self.verification_method == "exact" else None
+        return verify_candidates(
+            candidate_pairs,
+            threshold,
+            signatures=signature_matrix,
+            shingles=shingles,
+            method=self.verification_method,
+        )
+
+    # Compute the shingles of the documents with the shingling operation selected in constants.py
+    # @return a sparse matrix which encodes the shingles present in each document
+    def shingle(self, X):
+        return shingle_documents(
+            documents=X, shingle_size=self.shingle_size, window_step=self.window_step
+        )
+
     # Score the model by comparing the predicted pairs with the ground truth. We use F1 score to evaluate the model
     # @return the F1 score, precision, recall, false positives, false negatives, true positives, true negatives
-    def score(self, X, y, file_paths=None):
+    def score(self, X, y, file_paths=None, metadata=None):
         # Get the predicted pairs from the LSH model
-        predicted_pairs = self.predict(X, file_paths=file_paths, optimization=True)
+        predicted_pairs = self.predict(
+            X, file_paths=file_paths, optimization=True, metadata=metadata
+        )
 
         del file_paths
 
-        # Calculate true positives, false positives, and false negatives using their definitions
-        true_positives = len(predicted_pairs & y)
+        with profiler.stage("score", items=len(predicted_pairs)):
+            # Encode the pairs as single int64 values, so the confusion counts follow from an intersection of sorted arrays
+            nr_docs = len(X)
+            predicted_pairs = np.unique(encode_pairs(predicted_pairs, nr_docs))
+            ground_truth_pairs = np.unique(encode_pairs(to_pair_array(y), nr_docs))
 
-        # Calculate false positives & negatives using set difference
-        false_positives = len(predicted_pairs - y)
-        false_negatives = len(y - predicted_pairs)
+            # Calculate true positives, false positives, and false negatives using their definitions
+            true_positives = len(
+                np.intersect1d(predicted_pairs, ground_truth_pairs, assume_unique=True)
+            )
+            false_positives = len(predicted_pairs) - true_positives
+            false_negatives = len(ground_truth_pairs) - true_positives
 
         # Calculate true negatives
         total_possible_pairs = len(X) * (len(X) - 1) // 2
@@ -0,0 +1,118 @@
+import os
+import pickle
+import hashlib
+from collections import OrderedDict
+import numpy as np
+from scipy.sparse import issparse
+from src.constants import SIGNATURE_CACHE_BYTES, SIGNATURE_CACHE_DIR
+from src.common import create_dir_if_not_exists
+
+
+# Cache for shingle and signature matrices, so that models which share the shingle and hashing parameters
+# (and only differ in e.g. n_bands or K) do not recompute them.
+# The most recently used entries are kept in memory, as long as their matrices take at most {max_bytes} bytes together.
+# The least recently used entry is evicted first, an entry which is larger than {max_bytes} on its own is not kept in memory.
+# If {cache_dir} is set, entries are also written to disk, so they can be shared between processes and runs.
+class SignatureCache:
+    def __init__(self, max_bytes=SIGNATURE_CACHE_BYTES, cache_dir=SIGNATURE_CACHE_DIR):
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self._entries = OrderedDict()
+        # Total size of the entries in memory
+        self.nbytes = 0
+
+    # Get the value stored under {key}, first from memory and then from disk
+    # @return the cached value, or None if the key is not cached
+    def get(self, key):
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+        file_path = self._file_path(key)
+        if file_path is None or not os.path.exists(file_path):
+            return None
+
+        try:
+            with open(file_path, "rb") as file:
+                value = pickle.load(file)
+        except Exception:
+            # An unreadable file is treated as a cache miss, it will be overwritten
+            return None
+
+        self._store_in_memory(key, value)
+        return value
+
+    # Store {value} under {key} in memory and, if enabled, on disk
+    def put(self, key, value):
+        self._store_in_memory(key, value)
+
+        file_path = self._file_path(key)
+        if file_path is not None:
+            create_dir_if_not_exists(self.cache_dir)
+            # Write to a temporary file first, so other processes never read a half-written file
+            temp_file_path = f"{file_path}.{os.getpid()}.tmp"
+            with open(temp_file_path, "wb") as file:
+                pickle.dump(value, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_file_path, file_path)
+
+    # Get the value stored under {key}, or compute and store it if it is not cached
+    # @return the (cached) value
+    def get_or_compute(self, key, compute):
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        self._entries.clear()
+        self.nbytes = 0
+
+    def _store_in_memory(self, key, value):
+        if key in self._entries:
+            self.nbytes -= _nbytes(self._entries.pop(key))
+
+        size = _nbytes(value)
+        if size > self.max_bytes:
+            return
+
+        self._entries[key] = value
+        self.nbytes += size
+        # Evict the least recently used entries
+        while self.nbytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.nbytes -= _nbytes(evicted)
+
+    def _file_path(self, key):
+        if not self.cache_dir:
+            return None
+        return os.path.join(
+            self.cache_dir, hashlib.sha1(repr(key).encode("utf-8")).hexdigest() + ".pkl"
+        )
+
+
+# @return the number of bytes used by the arrays of a dense or sparse matrix
+def _nbytes(value):
+    if issparse(value):
+        return sum(
+            getattr(value, name).nbytes
+            for name in ("data", "indices", "indptr", "row", "col")
+            if hasattr(value, name)
+        )
+    return np.asarray(value).nbytes
+
+
+# Compute a fingerprint of the content of a corpus, documents with the same content in the same order get the same fingerprint
+# @return the fingerprint as a hex string
+def corpus_fingerprint(documents):
+    fingerprint = hashlib.sha1()
+    for doc in documents:
+        encoded = doc.encode("utf-8")
+        # Include the length so that e.g. ["ab", "c"] and ["a", "bc"] get different fingerprints
+        fingerprint.update(len(encoded).to_bytes(8, "little"))
+        fingerprint.update(encoded)
+    return fingerprint.hexdigest()
+
+
+# Cache shared by all models in this process
+signature_cache = SignatureCache()
@@ -1,40 +1,79 @@
 import numpy as np
-from src.constants import RANDOM_SEED
+from src.constants import RANDOM_SEED, BAND_KEY_MODE
 
 
 # Hashing class to generate hash functions and hash band signatures
+# If {nested} is True, every set of coefficients is drawn from its own random stream. The first k MinHash functions are
+# then the same for every n_hash >= k, so the first k rows of a signature matrix are exactly the signatures for n_hash = k.
 class Hashing:
-    def __init__(self, n_hash, n_bands: int = 4, K: int = 100000, seed=RANDOM_SEED):
+    def __init__(
+        self,
+        n_hash,
+        n_bands: int = 4,
+        K: int = 100000,
+        seed=RANDOM_SEED,
+        nested: bool = False,
+        band_key_mode: str = BAND_KEY_MODE,
+    ):
         self._mersenne_prime = np.uint64((1 << 61) - 1)
         self._max_hash = np.uint64((1 << 32) - 1)
         self.seed = seed
         self.n_hash = n_hash
         self.n_bands = n_bands
         self.K = K
+        self.nested = nested
+        self.band_key_mode = band_key_mode
+
+        if nested:
+            # Independent streams for the A and B coefficients and the LSH coefficients
+            a_rng, b_rng, coeff_rng = [
+                np.random.default_rng(child)
+                for child in np.random.SeedSequence(self.seed).spawn(3)
+            ]
+        else:
+            # Local RNG instance shared by all coefficients
+            a_rng = b_rng = coeff_rng = np.random.default_rng(self.seed)
 
-        rng = np.random.default_rng(self.seed)  # Local RNG instance
         # Generate random coefficients for MinHash functions
-        self.As = rng.integers(
+        self.As = a_rng.integers(
             1, self._mersenne_prime, size=(self.n_hash,), dtype=np.uint64
         )
-        self.Bs = rng.integers(
+        self.Bs = b_rng.integers(
             0, self._mersenne_prime, size=(self.n_hash,), dtype=np.uint64
         )
         # Generate random coefficients for LSH hashing
-        self.coeff = rng.integers(
+        self.coeff = coeff_rng.integers(
             1, self.K, size=(self.n_bands, self.n_hash // self.n_bands)
         )
 
     # One-pass-implementation of MinHashing. Hashes the index of the shingle to a hash value.
     # We implement a linear formula and use the modulo operation to avoid overflow
+    # {index} can be a single shingle index or an array of indices, the result then has shape (n_hash, *index.shape)
     def hash_idxs(self, index):
+        index = np.asarray(index, dtype=np.uint64)
+        # Add an axis for every dimension of the index so that all hash functions are applied to all indices at once
+        new_axes = (slice(None),) + (np.newaxis,) * index.ndim
         return np.bitwise_and(
-            (self.As * index + self.Bs) % self._mersenne_prime, self._max_hash
+            (self.As[new_axes] * index + self.Bs[new_axes]) % self._mersenne_prime,
+            self._max_hash,
         ).astype(
             np.uint32
         )  # Change to uint32 to avoid memory overflow
 
-    # Hashes the signature of a band to a hash value by using the dot product of random coefficients and the signature
-    # Modulo operation is used to avoid overflow, K is the size of a bucket.
-    def hash_band_signature(self, sig, i):
-        return np.dot(self.coeff[i], sig) % self.K
+    # Compute the bucket key of a band for all documents at once, {band} has the dimensions rows x num_documents.
+    # With band_key_mode "dot" the key is the dot product of the random coefficients of band {i} and the band signature,
+    # modulo the number of buckets K (computed for all columns in one dot product),
+    # with "exact" the key is the raw bytes of the band, so only documents with identical band signatures share a bucket.
+    # @return an array with one key per document
+    def band_keys(self, band, i):
+        if self.band_key_mode == "exact":
+            # View the band signature of each document (a row of the transposed band) as a single opaque value
+            return (
+                np.ascontiguousarray(band.T, dtype=np.uint32)
+                .view(np.dtype((np.void, 4 * band.shape[0])))
+                .ravel()
+            )
+        elif self.band_key_mode == "dot":
+            return np.dot(self.coeff[i], band) % self.K
+        else:
+            raise ValueError(f"Unknown band key mode: {self.band_key_mode}")
@@ -1,40 +1,124 @@
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from src.LSH.hashing import Hashing
-from src.helpers.helper import timeit
+from src.constants import MAX_BUCKET_SIZE, RANDOM_SEED
+from src.helpers.helper import encode_pairs, decode_pairs
 
 
 # Search for similar pairs of documents using the Locality Sensitive Hashing (LSH) algorithm
-# @return the pairs of similar documents
+# The bands are independent, so with {n_jobs} > 1 groups of bands are processed by a pool of threads
+# (numpy releases the GIL while hashing and sorting). The result does not depend on the number of jobs.
+# @return the pairs of similar documents as an (n, 2) int64 array, sorted and without duplicates
 # @timeit
-def lsh(sig: np.ndarray, hashing: Hashing):
+def lsh(
+    sig: np.ndarray,
+    hashing: Hashing,
+    max_bucket_size: int = MAX_BUCKET_SIZE,
+    n_jobs: int = 1,
+):
     # We will separate the signature matrix into bands and hash each band
-    # Get the number of hash functions, bands, and documents
-    nr_hash = sig.shape[0]
+    # Get the number of bands and documents
     nr_bands = hashing.n_bands
     nr_docs = sig.shape[1]
+
+    if nr_bands == 0:
+        return np.empty((0, 2), dtype=np.int64)
+
+    # Split the bands into one group per job
+    band_groups = [
+        group for group in np.array_split(np.arange(nr_bands), n_jobs) if len(group)
+    ]
+
+    if len(band_groups) > 1:
+        with ThreadPoolExecutor(max_workers=len(band_groups)) as executor:
+            group_pairs = list(
+                executor.map(
+                    lambda bands: lsh_bands(sig, hashing, bands, max_bucket_size),
+                    band_groups,
+                )
+            )
+    else:
+        group_pairs = [lsh_bands(sig, hashing, band_groups[0], max_bucket_size)]
+
+    # A pair of documents can share a bucket in multiple bands, so only keep the unique pairs
+    return decode_pairs(np.unique(np.concatenate(group_pairs)), nr_docs)
+
+
+# Find the candidate pairs of the given {bands} of the signature matrix
+# @return the unique candidate pairs of these bands, encoded as int64 values (see encode_pairs)
+def lsh_bands(sig: np.ndarray, hashing: Hashing, bands, max_bucket_size: int):
+    # Get the number of hash functions and documents
+    nr_hash = sig.shape[0]
+    nr_docs = sig.shape[1]
     # Calculate the number of rows per band
-    r = nr_hash // nr_bands
+    r = nr_hash // hashing.n_bands
 
-    # Initialize a set to store the similar pairs
-    similar_pairs = set()
+    # Collect the encoded candidate pairs of each band
+    band_pairs = []
 
     # Iterate through each band
-    for i in range(nr_bands):
+    for i in bands:
         band_start = i * r
         band_end = band_start + r
         # Get the band signatures for each document in the current band
         band_signatures = sig[band_start:band_end, :]
 
-        # Compute hash for each column (document) in the current band by implementing numpy's apply_along_axis function
-        hash_indices = np.apply_along_axis(
-            hashing.hash_band_signature, 0, band_signatures, i
-        )
+        # Compute the bucket key for each column (document) in the current band, for all documents at once
+        hash_indices = hashing.band_keys(band_signatures, i)
+
+        # Use a seeded RNG per band so that sampling oversized buckets is reproducible, regardless of how bands are grouped
+        rng = np.random.default_rng([RANDOM_SEED, i])
 
-        # Find candidate pairs by comparing the hash values of the signatures (of each document) in the current band
+        # Find candidate pairs by grouping the documents on the hash values of their signatures in the current band
         # If the hash values are the same in one or more bands, the documents are considered similar
-        for c1 in range(nr_docs):
-            for c2 in range(c1 + 1, nr_docs):
-                if hash_indices[c1] == hash_indices[c2]:
-                    similar_pairs.add((c1, c2))
+        pairs = bucket_pairs(hash_indices, max_bucket_size, rng)
+        band_pairs.append(encode_pairs(pairs, nr_docs))
+
+    return np.unique(np.concatenate(band_pairs))
+
+
+# Group the documents by their bucket key and emit every pair of documents within the same bucket.
+# Instead of comparing all pairs of documents, the keys are sorted so that documents sharing a bucket become neighbours.
+# The cost is therefore O(n log n) for sorting plus the number of emitted pairs.
+# Buckets larger than {max_bucket_size} are sampled down to {max_bucket_size} documents.
+# @return the pairs (c1 < c2) of documents sharing a bucket as an (n, 2) int64 array
+def bucket_pairs(keys: np.ndarray, max_bucket_size: int = MAX_BUCKET_SIZE, rng=None):
+    if rng is None:
+        rng = np.random.default_rng(RANDOM_SEED)
+
+    # Sort the documents by key, a stable sort keeps the document indices ascending within a bucket
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+
+    # Find where each bucket starts in the sorted order and how many documents it holds
+    is_start = np.ones(len(sorted_keys), dtype=bool)
+    is_start[1:] = sorted_keys[1:] != sorted_keys[:-1]
+    starts = np.flatnonzero(is_start)
+    sizes = np.diff(np.append(starts, len(sorted_keys)))
+
+    pairs = [np.empty((0, 2), dtype=np.int64)]
+
+    # Buckets of the same size are handled together, so all their pairs are created in one vectorized step
+    for size in np.unique(sizes[(sizes > 1) & (sizes <= max_bucket_size)]):
+        bucket_starts = starts[sizes == size]
+        # Documents of every bucket of this size, one row per bucket
+        members = order[bucket_starts[:, np.newaxis] + np.arange(size)]
+        pairs.append(_pairs_within_buckets(members))
+
+    # Oversized buckets are sampled to guard against a quadratic number of pairs
+    for start, size in zip(
+        starts[sizes > max_bucket_size], sizes[sizes > max_bucket_size]
+    ):
+        members = np.sort(
+            rng.choice(order[start : start + size], max_bucket_size, replace=False)
+        )
+        pairs.append(_pairs_within_buckets(members[np.newaxis, :]))
+
+    return np.concatenate(pairs).astype(np.int64, copy=False)
+
 
-    return similar_pairs
+# Create all pairs of documents within each row of {members}, where each row holds the (ascending) documents of a bucket
+# @return the pairs as an (n, 2) array
+def _pairs_within_buckets(members: np.ndarray):
+    first, second = np.triu_indices(members.shape[1], k=1)
+    return np.stack((members[:, first].ravel(), members[:, second].ravel()), axis=1)
@@ -1,34 +1,183 @@
+import os
+import tempfile
 import numpy as np
+from multiprocessing import Pool
 from src.LSH.hashing import Hashing
-from scipy.sparse import csr_matrix
-from src.helpers.helper import timeit
+from src.LSH.shingle import shingle_documents
+from scipy.sparse import spmatrix
+from src.constants import MINHASH_BLOCK_SIZE
 
 
 # Reduce the dimensionality of the shingles matrix by creating a signature matrix
+# The shingles matrix has one row per shingle and one column per document, in CSR or CSC format
 # @return the signature matrix
 # @timeit
-def compute_signature_matrix(shingles: csr_matrix, hashing: Hashing) -> np.ndarray:
+def compute_signature_matrix(
+    shingles: spmatrix, hashing: Hashing, block_size: int = MINHASH_BLOCK_SIZE
+) -> np.ndarray:
     num_documents = shingles.shape[1]
     # Initialize the signature matrix with max hash values. The dimensions are n_hash x num_documents
     sig = np.full(
         (hashing.n_hash, num_documents), hashing._max_hash, dtype=np.uint32
     )  # use uint32 to save memory
 
-    # Iterate over each shingle
-    for s_index in range(shingles.shape[0]):
-        # Get the indices of documents that contain the shingle
-        docs_with_shingle_indices = shingles[s_index].indices
+    # In CSC format the shingle indices of each document are stored next to each other,
+    # document j owns the entries indices[indptr[j]:indptr[j + 1]]
+    shingles = shingles.tocsc()
+    indptr = shingles.indptr.astype(np.int64)
+    indices = shingles.indices
 
-        # Only proceed if there are documents with this shingle
-        if docs_with_shingle_indices.size > 0:
-            # Get the hash values for the index of the current shingle
-            hashes = hashing.hash_idxs(s_index)
+    doc_start = 0
+    # Process the documents in blocks which contain at most {block_size} shingle entries (or a single larger document)
+    while doc_start < num_documents:
+        doc_end = int(
+            np.searchsorted(indptr, indptr[doc_start] + block_size, side="right") - 1
+        )
+        doc_end = min(max(doc_end, doc_start + 1), num_documents)
 
-            # Update signature matrix using broadcasting
-            # The minimum hash value is taken for each document that contains the shingle between the hash value and the current value in the signature matrix
-            sig[:, docs_with_shingle_indices] = np.minimum(
-                sig[:, docs_with_shingle_indices], hashes[:, np.newaxis]
+        entries_start, entries_end = indptr[doc_start], indptr[doc_end]
+        # Only documents with at least one shingle get a signature, the others keep the max hash values
+        doc_sizes = np.diff(indptr[doc_start : doc_end + 1])
+        non_empty_docs = np.flatnonzero(doc_sizes)
+
+        if non_empty_docs.size > 0:
+            # Get the hash values for the indices of all shingles in the block, the dimensions are n_hash x entries
+            hashes = hashing.hash_idxs(indices[entries_start:entries_end])
+
+            # Take the minimum hash value over the shingles of each document (segmented minimum)
+            segment_starts = indptr[doc_start:doc_end][non_empty_docs] - entries_start
+            sig[:, doc_start + non_empty_docs] = np.minimum.reduceat(
+                hashes, segment_starts, axis=1
             )
 
+        doc_start = doc_end
+
     # Once the computation is complete, return the signature matrix
     return sig
+
+
+# Compute the signature matrix in parallel, with {n_jobs} worker processes which each MinHash a shard of the documents (columns).
+# The workers write their signatures straight into their columns of a memory-mapped signature matrix, so the shards are never
+# sent back, concatenated or copied. The result is identical to compute_signature_matrix.
+# @return the signature matrix
+def compute_signature_matrix_parallel(
+    shingles: spmatrix,
+    hashing: Hashing,
+    n_jobs: int,
+    block_size: int = MINHASH_BLOCK_SIZE,
+) -> np.ndarray:
+    shingles = shingles.tocsc()
+    num_documents = shingles.shape[1]
+
+    # Split the documents into shards with about the same number of shingles
+    boundaries = np.searchsorted(
+        shingles.indptr, np.linspace(0, shingles.nnz, n_jobs + 1), side="left"
+    )
+    boundaries[0], boundaries[-1] = 0, num_documents
+    shards = [
+        (start, end, {"shingles": shingles[:, start:end]})
+        for start, end in zip(boundaries[:-1], boundaries[1:])
+        if end > start
+    ]
+
+    return _compute_shards(shards, hashing, num_documents, n_jobs, block_size)
+
+
+# Shingle and MinHash documents in parallel, with {n_jobs} worker processes which each handle a shard of the documents.
+# This is only possible if the shingle ids do not depend on the other documents, so {hashed_shingles} has to be enabled.
+# The shingling mode is passed to the workers explicitly, instead of being read from WORD_BASED and HASHED_SHINGLES there.
+# The result is identical to shingling all documents with shingle_documents and calling compute_signature_matrix.
+# @return the signature matrix
+def compute_document_signatures_parallel(
+    documents,
+    hashing: Hashing,
+    shingle_size: int,
+    n_jobs: int,
+    block_size: int = MINHASH_BLOCK_SIZE,
+    window_step: int = 1,
+    word_based: bool = True,
+    hashed_shingles: bool = True,
+) -> np.ndarray:
+    boundaries = np.linspace(0, len(documents), n_jobs + 1).astype(int)
+    shards = [
+        (
+            start,
+            end,
+            {
+                "documents": documents[start:end],
+                "shingle_size": shingle_size,
+                "window_step": window_step,
+                "word_based": word_based,
+                "hashed_shingles": hashed_shingles,
+            },
+        )
+        for start, end in zip(boundaries[:-1], boundaries[1:])
+        if end > start
+    ]
+
+    return _compute_shards(shards, hashing, len(documents), n_jobs, block_size)
+
+
+# Run the shards in a process pool, every shard writes the signatures of its documents to the signature matrix.
+# The matrix is a memory-mapped temporary file. It is created in /dev/shm (memory) if available; elsewhere it is a
+# regular temporary file, whose pages are cached in memory but may be written to disk.
+# On POSIX systems a file can be removed while it is mapped, so the file is removed as soon as the workers are done
+# and the returned matrix is a view of the mapping, which stays valid until the matrix is released (no copy).
+# Other systems (Windows) can not remove a mapped file, there the signatures are copied out and the mapping is closed first.
+# @return the signature matrix
+def _compute_shards(shards, hashing, num_documents, n_jobs, block_size):
+    shape = (hashing.n_hash, num_documents)
+    if hashing.n_hash * num_documents == 0:
+        # An empty file can not be memory-mapped
+        return np.full(shape, hashing._max_hash, dtype=np.uint32)
+
+    file_descriptor, file_path = tempfile.mkstemp(
+        suffix=".sig", dir="/dev/shm" if os.path.isdir("/dev/shm") else None
+    )
+    os.close(file_descriptor)
+    try:
+        sig = np.memmap(file_path, dtype=np.uint32, mode="w+", shape=shape)
+        tasks = [
+            (file_path, shape, start, end, shard, hashing, block_size)
+            for start, end, shard in shards
+        ]
+        with Pool(processes=n_jobs) as pool:
+            pool.map(_compute_shard, tasks)
+    except BaseException:
+        # Release the mapping before removing the file
+        sig = None
+        os.remove(file_path)
+        raise
+
+    if os.name == "posix":
+        os.remove(file_path)
+        # A plain ndarray view, its base keeps the mapping alive
+        return sig.view(np.ndarray)
+
+    signature_matrix = np.array(sig)
+    del sig
+    os.remove(file_path)
+    return signature_matrix
+
+
+# Compute the signatures of one shard in a worker process and write them to columns start:end of the memory-mapped signature matrix
+def _compute_shard(task):
+    file_path, shape, start, end, shard, hashing, block_size = task
+
+    if "documents" in shard:
+        shingles = shingle_documents(
+            documents=shard["documents"],
+            shingle_size=shard["shingle_size"],
+            window_step=shard["window_step"],
+            word_based=shard["word_based"],
+            hashed_shingles=shard["hashed_shingles"],
+        )
+    else:
+        shingles = shard["shingles"]
+
+    sig = np.memmap(file_path, dtype=np.uint32, mode="r+", shape=shape)
+    sig[:, start:end] = compute_signature_matrix(
+        shingles=shingles, hashing=hashing, block_size=block_size
+    )
+    # The mapping is shared with the main process, so the signatures are visible there without flushing them to the file
+    del sig
@@ -1,10 +1,44 @@
 import numpy as np
 import gc
-from scipy.sparse import csr_matrix
-from typing import List, Set, Tuple
+import zlib
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.sparse import csr_matrix, csc_matrix
+from typing import Iterable, Iterator, List, Set, Tuple
+from src.constants import SHINGLE_HASH_BITS, WORD_BASED, HASHED_SHINGLES
 from src.helpers.helper import timeit
 
 
+# Compute shingles with the correct shingling operation, depending on whether we want to operate with word- or character-shingles.
+# With HASHED_SHINGLES the shingles are hashed straight to ids instead of being indexed in a global vocabulary.
+# {word_based} and {hashed_shingles} default to WORD_BASED[0] and HASHED_SHINGLES[0], they are passed explicitly where the
+# globals of the current process can not be relied on (e.g. in worker processes).
+# @return a sparse matrix which encodes the shingles present in each document
+def shingle_documents(
+    documents,
+    shingle_size: int,
+    window_step: int = 1,
+    word_based: bool = None,
+    hashed_shingles: bool = None,
+):
+    if word_based is None:
+        word_based = WORD_BASED[0]
+    if hashed_shingles is None:
+        hashed_shingles = HASHED_SHINGLES[0]
+
+    if hashed_shingles:
+        shingle = (
+            word_based_hashed_shingle if word_based else character_based_hashed_shingle
+        )
+    elif word_based:
+        shingle = word_based_shingle
+    else:
+        shingle = character_based_shingle
+
+    return shingle(
+        documents=documents, shingle_size=shingle_size, window_step=window_step
+    )
+
+
 # @timeit
 # Creates shingles from a list of documents. These shingles are created by splitting the documents into words.
 # This function gets called when WORD_BASED[0] = True in constants.py. Therefore these documents still consist of many words.
@@ -158,3 +192,114 @@ def char_based_encode_shingles(
     )  # use uint8 to save memory
 
     return shingles_matrix
+
+
+# Creates shingles from a list of documents without building a global vocabulary of unique shingles.
+# Each word-based shingle is hashed straight to a {hash_bits}-bit id while the documents stream through, which means
+# only one pass over the documents is needed and no shingle strings or tuples are kept in memory.
+# @return a sparse matrix (CSC, one column per document) which encodes the hashed shingle ids present in each document
+def word_based_hashed_shingle(
+    documents: Iterable[str],
+    shingle_size: int,
+    window_step: int = 1,
+    hash_bits: int = SHINGLE_HASH_BITS,
+) -> csc_matrix:
+    return encode_hashed_shingles(
+        hashed_shingle_ids(documents, shingle_size, window_step, True, hash_bits),
+        hash_bits,
+    )
+
+
+# Creates shingles from a list of documents without building a global vocabulary of unique shingles.
+# Each character-based shingle is hashed straight to a {hash_bits}-bit id while the documents stream through.
+# @return a sparse matrix (CSC, one column per document) which encodes the hashed shingle ids present in each document
+def character_based_hashed_shingle(
+    documents: Iterable[str],
+    shingle_size: int,
+    window_step: int = 1,
+    hash_bits: int = SHINGLE_HASH_BITS,
+) -> csc_matrix:
+    return encode_hashed_shingles(
+        hashed_shingle_ids(documents, shingle_size, window_step, False, hash_bits),
+        hash_bits,
+    )
+
+
+# Stream through the documents and yield, per document, the sorted unique ids of its hashed shingles.
+# The ids only depend on the content of the shingle, so they are stable across documents, batches and runs.
+# @return a generator of uint64 arrays, one per document
+def hashed_shingle_ids(
+    documents: Iterable[str],
+    shingle_size: int,
+    window_step: int = 1,
+    word_based: bool = True,
+    hash_bits: int = SHINGLE_HASH_BITS,
+) -> Iterator[np.ndarray]:
+    # Sparse matrices store their indices as signed 64-bit integers, so at most 62 bits can be used for the ids
+    assert 0 < hash_bits <= 62, f"hash_bits should be between 1 and 62, got {hash_bits}"
+    mask = np.uint64((1 << hash_bits) - 1)
+
+    for doc in documents:
+        if word_based:
+            # Each word is hashed to a token id with crc32, which (unlike hash()) is stable across processes
+            tokens = np.fromiter(
+                (zlib.crc32(word.encode("utf-8")) for word in doc.split()),
+                dtype=np.uint64,
+            )
+        else:
+            # The unicode code points of the characters are the token ids
+            tokens = np.frombuffer(doc.encode("utf-32-le"), dtype=np.uint32).astype(
+                np.uint64
+            )
+
+        yield np.unique(_hash_windows(tokens, shingle_size, window_step) & mask)
+
+
+# Combine the token ids of every window of {shingle_size} tokens into one 64-bit shingle hash
+# @return a uint64 array with one hash per shingle
+def _hash_windows(tokens: np.ndarray, shingle_size: int, window_step: int):
+    if len(tokens) < shingle_size:
+        return np.empty(0, dtype=np.uint64)
+
+    # Every row of windows is one shingle, this is a view and does not copy the tokens
+    windows = sliding_window_view(tokens, shingle_size)[::window_step]
+
+    # Polynomial hash of the tokens in the window, uint64 arithmetic wraps around on overflow
+    hashes = np.zeros(len(windows), dtype=np.uint64)
+    for j in range(shingle_size):
+        hashes = hashes * np.uint64(0x100000001B3) + windows[:, j]
+
+    # Mix the bits (splitmix64 finalizer) so that the lower bits used for the id are well distributed
+    hashes ^= hashes >> np.uint64(30)
+    hashes *= np.uint64(0xBF58476D1CE4E5B9)
+    hashes ^= hashes >> np.uint64(27)
+    hashes *= np.uint64(0x94D049BB133111EB)
+    hashes ^= hashes >> np.uint64(31)
+    return hashes
+
+
+# Create a sparse matrix from the per-document shingle ids, the shingle id is used directly as the row index.
+# @return a sparse matrix in Compressed Sparse Column format with 2^{hash_bits} rows and one column per document
+def encode_hashed_shingles(
+    document_ids: Iterable[np.ndarray], hash_bits: int = SHINGLE_HASH_BITS
+) -> csc_matrix:
+    indices = []
+    indptr = [0]
+
+    for ids in document_ids:
+        indices.append(ids.astype(np.int64))
+        indptr.append(indptr[-1] + len(ids))
+
+    indices = np.concatenate(indices) if indices else np.empty(0, dtype=np.int64)
+
+    # The ids of a document are the row indices of its column, CSC avoids converting COO lists
+    shingles_matrix = csc_matrix(
+        (
+            np.ones(len(indices), dtype=np.uint8),
+            indices,
+            np.asarray(indptr, dtype=np.int64),
+        ),
+        shape=(1 << hash_bits, len(indptr) - 1),
+    )  # use uint8 to save memory
+
+    return shingles_matrix
@@ -0,0 +1,149 @@
+import os
+import json
+import numpy as np
+from src.LSH.hashing import Hashing
+from src.common import create_dir_if_not_exists
+
+HEADER_FILE = "header.json"
+SIGNATURES_FILE = "signatures.bin"
+
+
+# On-disk store for signature matrices which do not fit in memory.
+# The signatures are stored as raw uint32 values in row-major (C) order, so every row is contiguous on disk and banding
+# reads a band sequentially. To append documents without rewriting the file, every row has room for {capacity} documents;
+# when the store is full, the capacity is doubled and the file is rewritten once. A store created with the final number
+# of documents as its capacity is one contiguous block.
+# The file is opened as a memory map with the shape n_hash x num_documents, so slicing a band out of it does not copy.
+# A small JSON header next to the file stores the hashing and shingle settings the signatures were computed with.
+class SignatureStore:
+    def __init__(self, path, header):
+        self.path = path
+        self.header = header
+
+    # Create a new, empty store in the directory {path} with room for {capacity} documents,
+    # an existing store in that directory is overwritten
+    # @return the created store
+    @classmethod
+    def create(
+        cls,
+        path,
+        hashing: Hashing,
+        shingle_size: int,
+        window_step: int,
+        word_based: bool,
+        hashed_shingles: bool,
+        capacity: int = 0,
+    ):
+        create_dir_if_not_exists(path)
+        header = {
+            "seed": hashing.seed,
+            "n_hash": int(hashing.n_hash),
+            "shingle_size": int(shingle_size),
+            "window_step": int(window_step),
+            "word_based": bool(word_based),
+            "hashed_shingles": bool(hashed_shingles),
+            "num_documents": 0,
+            "capacity": 0,
+        }
+        # Start with an empty signatures file
+        open(os.path.join(path, SIGNATURES_FILE), "wb").close()
+
+        store = cls(path, header)
+        store._resize(int(capacity))
+        store._write_header()
+        return store
+
+    # Open an existing store in the directory {path}
+    # @return the opened store
+    @classmethod
+    def open(cls, path):
+        with open(os.path.join(path, HEADER_FILE), "r", encoding="utf-8") as file:
+            header = json.load(file)
+        return cls(path, header)
+
+    @property
+    def n_hash(self):
+        return self.header["n_hash"]
+
+    @property
+    def num_documents(self):
+        return self.header["num_documents"]
+
+    @property
+    def capacity(self):
+        return self.header["capacity"]
+
+    # Append the signatures (n_hash x number of new documents) of new documents to the end of the store
+    def append(self, signatures: np.ndarray):
+        assert (
+            signatures.shape[0] == self.n_hash
+        ), f"Expected {self.n_hash} hash values per document, got {signatures.shape[0]}"
+
+        num_documents = self.num_documents + signatures.shape[1]
+        if num_documents > self.capacity:
+            self._resize(max(num_documents, 2 * self.capacity))
+
+        if signatures.shape[1] > 0 and self.n_hash > 0:
+            stored = self._memmap("r+")
+            stored[:, self.num_documents : num_documents] = signatures
+            stored.flush()
+            del stored
+
+        self.header["num_documents"] = num_documents
+        self._write_header()
+
+    # Forget the documents after the first {num_documents}, their room is reused by the next append
+    def truncate(self, num_documents):
+        assert (
+            0 <= num_documents <= self.num_documents
+        ), f"Can not truncate a store of {self.num_documents} documents to {num_documents} documents"
+        self.header["num_documents"] = int(num_documents)
+        self._write_header()
+
+    # Memory map the signature matrix, the dimensions are n_hash x num_documents.
+    # Bands (slices of rows) of the returned matrix are views of the file and are only read from disk when used.
+    # @return the signature matrix as a read-only memory map
+    def signatures(self):
+        if self.num_documents == 0 or self.n_hash == 0:
+            # A memory map of an empty file is not possible
+            return np.empty((self.n_hash, self.num_documents), dtype=np.uint32)
+
+        return self._memmap("r")[:, : self.num_documents]
+
+    # Memory map the whole file, including the room for documents which are not added yet
+    def _memmap(self, mode):
+        return np.memmap(
+            os.path.join(self.path, SIGNATURES_FILE),
+            dtype=np.uint32,
+            mode=mode,
+            shape=(self.n_hash, self.capacity),
+        )
+
+    # Give every row of the file room for {capacity} documents. The new file is written next to the old one and
+    # replaces it once complete; the unused room is not written, so it does not take disk space on most file systems.
+    def _resize(self, capacity):
+        file_path = os.path.join(self.path, SIGNATURES_FILE)
+        temp_file_path = f"{file_path}.tmp"
+        with open(temp_file_path, "wb") as file:
+            file.truncate(self.n_hash * capacity * np.dtype(np.uint32).itemsize)
+
+        if self.num_documents > 0 and self.n_hash > 0:
+            old = self._memmap("r")
+            new = np.memmap(
+                temp_file_path,
+                dtype=np.uint32,
+                mode="r+",
+                shape=(self.n_hash, capacity),
+            )
+            # Copy row by row, so at most one row of the old file is read into memory at a time
+            for row in range(self.n_hash):
+                new[row, : self.num_documents] = old[row, : self.num_documents]
+            new.flush()
+            del old, new
+
+        os.replace(temp_file_path, file_path)
+        self.header["capacity"] = capacity
+
+    def _write_header(self):
+        with open(os.path.join(self.path, HEADER_FILE), "w", encoding="utf-8") as file:
+            json.dump(self.header, file, indent=4)
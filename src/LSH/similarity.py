@@ -0,0 +1,106 @@
+import numpy as np
+from scipy.sparse import spmatrix
+from src.constants import SIMILARITY_BATCH_SIZE
+
+# Candidate pair together with the similarity of the two documents
+CANDIDATE_DTYPE = np.dtype(
+    [("doc_a", np.int64), ("doc_b", np.int64), ("score", np.float64)]
+)
+
+
+# Compute the exact Jaccard similarity of pairs of documents from the shingles matrix (one row per shingle, one column per document)
+# The pairs are processed in vectorized batches of {batch_size} pairs
+# @return a float array with the Jaccard similarity of every pair
+def exact_jaccard(
+    shingles: spmatrix, pairs: np.ndarray, batch_size: int = SIMILARITY_BATCH_SIZE
+) -> np.ndarray:
+    pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+    # One row per document, so the shingles of a document can be selected by row
+    documents = shingles.T.tocsr().astype(bool)
+    # Number of shingles of each document
+    sizes = np.diff(documents.indptr)
+
+    similarities = np.zeros(len(pairs), dtype=np.float64)
+    for start in range(0, len(pairs), batch_size):
+        first = pairs[start : start + batch_size, 0]
+        second = pairs[start : start + batch_size, 1]
+
+        # The element-wise product of the rows contains the shingles present in both documents
+        intersection = np.asarray(
+            documents[first].multiply(documents[second]).sum(axis=1)
+        ).ravel()
+        union = sizes[first] + sizes[second] - intersection
+
+        # Two empty documents have a similarity of 0
+        similarities[start : start + batch_size] = np.divide(
+            intersection,
+            union,
+            out=np.zeros(len(first), dtype=np.float64),
+            where=union > 0,
+        )
+
+    return similarities
+
+
+# Estimate the Jaccard similarity of pairs of documents as the fraction of hash functions for which their signatures agree
+# The pairs are processed in vectorized batches of {batch_size} pairs
+# @return a float array with the estimated Jaccard similarity of every pair
+def estimated_jaccard(
+    sig: np.ndarray, pairs: np.ndarray, batch_size: int = SIMILARITY_BATCH_SIZE
+) -> np.ndarray:
+    pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+
+    similarities = np.zeros(len(pairs), dtype=np.float64)
+    for start in range(0, len(pairs), batch_size):
+        first = pairs[start : start + batch_size, 0]
+        second = pairs[start : start + batch_size, 1]
+        similarities[start : start + batch_size] = np.mean(
+            sig[:, first] == sig[:, second], axis=0
+        )
+
+    return similarities
+
+
+# Verify candidate pairs by their similarity and drop the pairs with a similarity below {threshold}.
+# With method "estimated" the similarity is estimated from the signatures, with "exact" it is computed from the shingles.
+# @return the remaining pairs as records (doc_a, doc_b, score)
+def verify_candidates(
+    pairs: np.ndarray,
+    threshold: float,
+    signatures: np.ndarray = None,
+    shingles: spmatrix = None,
+    method: str = "estimated",
+) -> np.ndarray:
+    if method == "exact":
+        scores = exact_jaccard(shingles, pairs)
+    elif method == "estimated":
+        scores = estimated_jaccard(signatures, pairs)
+    else:
+        raise ValueError(f"Unknown verification method: {method}")
+
+    keep = scores >= threshold
+    return pairs_to_records(np.asarray(pairs).reshape(-1, 2)[keep], scores[keep])
+
+
+# Convert an (n, 2) array of pairs (and optionally their scores) to records (doc_a, doc_b, score)
+# @return the records, the score is NaN if no scores are given
+def pairs_to_records(pairs: np.ndarray, scores: np.ndarray = None) -> np.ndarray:
+    pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+    records = np.empty(len(pairs), dtype=CANDIDATE_DTYPE)
+    records["doc_a"] = pairs[:, 0]
+    records["doc_b"] = pairs[:, 1]
+    records["score"] = np.nan if scores is None else scores
+    return records
+
+
+# Probability that two documents with Jaccard similarity {similarity} become a candidate pair in LSH with {n_bands} bands
+# of {rows} rows: 1 - (1 - s^r)^b (the S-curve)
+# @return the probability for every similarity
+def candidate_probability(similarity, rows: int, n_bands: int):
+    return 1 - (1 - np.power(similarity, rows)) ** n_bands
+
+
+# Similarity at which the S-curve rises the steepest, documents above this threshold are likely to become candidates
+# @return the approximate threshold (1/b)^(1/r)
+def candidate_threshold(rows: int, n_bands: int):
+    return (1 / n_bands) ** (1 / rows)
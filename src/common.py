@@ -102,6 +102,7 @@ def remove_generated_files():
         PREPROCESSED_DIR,
         PROCESSED_DIR,
         PARAPHRASED_DIR,
+        SIGNATURE_STORE_DIR,
         # EVALUATION_DIR[0],
         DATASET_METADATA_DIR,  # This is needed in-case the Corpus dataset is used
     ]
@@ -1,8 +1,4 @@
-from nltk.stem import WordNetLemmatizer
 from multiprocessing import cpu_count
-from nltk.corpus import stopwords
-from nltk.data import find
-import nltk
 
 ### Debug Constants
 DEBUG = False
@@ -21,6 +17,7 @@ EVALUATION_DIR = [ASSETS_DIR + "evaluation/"]
 CORPUS_DIR = ASSETS_DIR + "pan-plagiarism-corpus-2011/"
 DATASET_METADATA_DIR = ASSETS_DIR + "dataset_metadata/"
 WIKIPEDIA_DIR = ASSETS_DIR + "wikipedia-dataset/"
+SIGNATURE_STORE_DIR = ASSETS_DIR + "signatures/"
 
 ### File Extensions
 CSV_EXTENSION = ".csv"
@@ -41,6 +38,16 @@ TOKEN_TYPES = [
     "number",
     "keyword literal",
 ]
+# Token types which are replaced by their type in the preprocessed code, so renaming identifiers or changing literals
+# does not change the document. Keywords and operators keep their value, as they make up the structure of the code.
+NORMALIZED_TOKEN_TYPES = [
+    "class name",
+    "function",
+    "identifier",
+    "string",
+    "number",
+    "keyword literal",
+]
 
 ### corpus extraction
 FILE_CUTOFF = 350
@@ -53,6 +60,7 @@ EVALUATION_IMG = "/evaluation" + PNG_EXTENSION
 EVALUATION_CSV = "/evaluation" + CSV_EXTENSION
 COMPLETE_EVALUATION_CSV = EVALUATION_DIR[0] + "complete_evaluation" + CSV_EXTENSION
 FRAUD_PAIRS_FILE = PROCESSED_DIR + "fraud_pairs" + USED_FILE_EXTENSION
+PROFILE_CSV = EVALUATION_DIR[0] + "profile" + CSV_EXTENSION
 
 ### Preprocessing Constants
 WORD_BASED = [True]
@@ -62,6 +70,14 @@ PARAPHRASE_COUNT = 1
 PARAPHRASE_THRESHOLD = 0.2
 RANDOM_SEED = 42
 
+# Directory of the preprocessing cache (see PreprocessingCache), None disables the on-disk cache.
+# Entries are keyed by the content of the document and the preprocessing settings, so the cache is not removed on a FRESH_RUN.
+PREPROCESSING_CACHE_DIR = ASSETS_DIR + "preprocessing_cache/"
+# Increase when the preprocessing itself changes, so that older cache entries are no longer used
+PREPROCESSING_CACHE_VERSION = 1
+# SQLite database with the WordNet synonyms of every word that was paraphrased (see SynonymCache), None keeps them in memory only
+SYNONYM_CACHE_FILE = ASSETS_DIR + "synonyms.sqlite"
+
 
 ### Hashing Constants
 N_HASH = [
@@ -73,6 +89,39 @@ N_HASH = [
     # 600,
 ]  # Number of hash functions, Increasing this will increase the probabibility of finding similar documents but also increase the complexity
 
+# Hash shingles straight to an id instead of building a global vocabulary of unique shingles (see shingle.py).
+# This needs only one pass over the documents and gives ids which are stable across corpora, but changes the signatures.
+HASHED_SHINGLES = [False]
+SHINGLE_HASH_BITS = 32  # Number of bits of a hashed shingle id (at most 62)
+
+# Draw the MinHash coefficients from nested streams (see Hashing), so the signature for the largest n_hash in {N_HASH}
+# is computed once per shingle configuration and its first n_hash rows are reused for every smaller n_hash.
+# This changes the signatures compared to the default draw, so tuned parameters should be re-tuned when switching.
+NESTED_HASHING = [False]
+
+# Memory (in bytes) the signature cache of LSHModel may use for the shingle/signature matrices it keeps (0 disables the cache).
+# Every worker process of the optimisation has its own cache.
+SIGNATURE_CACHE_BYTES = 256 * 1024 * 1024
+# Directory for the on-disk tier of the signature cache (shared between processes and runs), None keeps the cache in memory only
+SIGNATURE_CACHE_DIR = None  # e.g. ASSETS_DIR + "signature_cache/"
+
+# Verify the LSH candidates by their Jaccard similarity, pairs with a similarity below VERIFICATION_THRESHOLD are dropped.
+# VERIFICATION_METHOD is "estimated" (agreement of the signatures) or "exact" (from the shingles), None disables verification
+VERIFICATION_THRESHOLD = None
+VERIFICATION_METHOD = "estimated"
+
+# Number of document pairs for which the similarity is computed at once
+SIMILARITY_BATCH_SIZE = 10_000
+
+# Run the final LSH of the pipeline out-of-core: documents are read from disk, shingled and MinHashed in chunks of
+# STREAM_CHUNK_SIZE documents and their signatures are appended to a memory-mapped store in SIGNATURE_STORE_DIR
+STREAMING_PIPELINE = False
+STREAM_CHUNK_SIZE = 1_000
+
+# Maximum number of (shingle, document) entries that are hashed at once when computing the signature matrix.
+# Memory usage of one block is roughly n_hash * MINHASH_BLOCK_SIZE * 8 bytes
+MINHASH_BLOCK_SIZE = 1 << 15
+
 ### LSH Constants
 N_BANDS = [
     # 5,
@@ -87,6 +136,14 @@ for band in N_BANDS:
     for hash_count in N_HASH:
         assert hash_count % band == 0, f"{hash_count} is not a multiple of {band}"
 
+# Maximum number of documents that are paired within a single bucket of a band. Larger buckets are sampled down to this size
+# (with {RANDOM_SEED}) so that one degenerate bucket (e.g. many empty documents) cannot emit a quadratic number of pairs
+MAX_BUCKET_SIZE = 1_000
+
+# How the band signature of a document is turned into a bucket key: "dot" hashes the band to one of K buckets with a
+# modular dot product (unrelated bands can collide), "exact" uses the raw bytes of the band (K is not used)
+BAND_KEY_MODE = "dot"
+
 K = [
     # 1_000,
     # 5_000,
@@ -113,28 +170,41 @@ OPTIMISATION_ITER_COUNT = (
     len(N_HASH) * len(N_BANDS) * len(K) * len(SHINGLE_SIZE) * len(WINDOW_STEP)
 )
 
+# Strategy used to search the hyperparameters: "grid" scores every sampled configuration on all documents,
+# "halving" uses successive halving to discard bad configurations on small samples of the documents first
+# Only the best 1/HALVING_ETA configurations survive a round of successive halving, the sample grows HALVING_ETA times per round.
+# The first round uses HALVING_MIN_SAMPLE_RATIO of the documents.
+OPTIMISATION_STRATEGY = "grid"
+HALVING_ETA = 3
+HALVING_MIN_SAMPLE_RATIO = 0.1
+
+# Prune (n_hash, n_bands) configurations before running them, based on the expected F1 score computed from the LSH S-curve
+# and the Jaccard similarities of a sample of PRESCREEN_SAMPLE_PAIRS fraud and non-fraud pairs.
+# Configurations with an expected F1 score below PRESCREEN_F1_RATIO times the best expected F1 score are not run.
+PRESCREEN_CONFIGURATIONS = False
+PRESCREEN_SAMPLE_PAIRS = 2_000
+PRESCREEN_F1_RATIO = 0.5
+
 # Parameter for plotting results
 TOP_VALUES = 10
 
 
-### Multithreading Constants
-# Source: https://stackoverflow.com/questions/20039659/python-multiprocessings-pool-process-limit
-AMOUNT_OF_WORKERS = cpu_count() // 2
-
-
-def download_nltk_resource(package_id, resource_name):
-    try:
-        # See if available
-        find(resource_name)
-    except Exception:
-        # Not found so download the resource
-        nltk.download(package_id, quiet=True)
-
+### Profiling Constants
+# Stages of the pipeline which are measured by the profiler (see profiling.py) and written to {PROFILE_CSV}
+PROFILE_STAGES = [
+    "read",
+    "preprocess",
+    "optimize",
+    "shingle",
+    "minhash",
+    "band",
+    "filter",
+    "score",
+]
+# Also profile every stage with cProfile and write the statistics next to the profile report (this slows the stages down)
+PROFILE_HOT_PATHS = False
 
-# Download resources if not available
-download_nltk_resource("stopwords", "corpora/stopwords")
-download_nltk_resource("wordnet", "corpora/wordnet")
-download_nltk_resource("punkt", "tokenizers/punkt")
 
-set_of_stopwords = set(stopwords.words("english"))
-lemmatiser = WordNetLemmatizer()
+### Multithreading Constants
+# Source: https://stackoverflow.com/questions/20039659/python-multiprocessings-pool-process-limit
+AMOUNT_OF_WORKERS = max(1, cpu_count() // 2)
@@ -1,17 +1,28 @@
+import os
 import time
 import functools
 from src.common import debug_print
 from src.constants import PARAPHRASED, WIKIPEDIA_DATA
-import pandas as pd
-
-
-# Iterate over the candidate pairs and filter out pairs with the same document number
-# @return the filtered pairs
-def filter_pairs_by_number(candidate_pairs, file_paths):
-    # Depending on which dataset we are using, the file names (and therefore information) are structured differently
-    # Extract the file number and type from the file path
-    def get_file_details(file_idx):
-        parts = file_paths[file_idx].split("/")
+import numpy as np
+
+# Metadata of a document, parsed once from its file path (see document_metadata).
+# The type is stored as an integer code, documents with the same type have the same code.
+DOCUMENT_METADATA_DTYPE = np.dtype(
+    [
+        ("number", np.int64),
+        ("type", np.int32),
+        ("paraphrased", np.bool_),
+        ("original_idx", np.int64),
+    ]
+)
+
+
+# Depending on which dataset we are using, the file names (and therefore information) are structured differently
+# Extract the file number and type from the file path
+# @return the file number and type
+def get_file_details(file_path):
+    parts = file_path.split("/")
+    try:
         number, file_type = (
             parts[2].split(".txt")[0].split("-")
             if WIKIPEDIA_DATA
@@ -21,49 +32,151 @@ def filter_pairs_by_number(candidate_pairs, file_paths):
             )
         )
         return int(number), file_type
+    except ValueError:
+        # Files which are not named like the files of the dataset (e.g. code files) are only identified by their name.
+        # For code files this includes the extension of the source file (Foo.py.txt -> Foo.py), so Foo.py and Foo.java differ.
+        return -1, parts[2].split(".txt")[0]
+
+
+# Build the metadata of the documents: the file number, file type, whether the file is paraphrased and the index of the
+# original file. This is done once per corpus, so candidate pairs can be filtered without parsing the file paths again.
+# @return a structured array with one record per file path
+def document_metadata(file_paths):
+    details = [get_file_details(file_path) for file_path in file_paths]
+
+    metadata = np.zeros(len(file_paths), dtype=DOCUMENT_METADATA_DTYPE)
+    if details:
+        metadata["number"] = [number for number, _ in details]
+        metadata["type"] = np.unique(
+            [file_type for _, file_type in details], return_inverse=True
+        )[1]
+    metadata["paraphrased"] = [PARAPHRASED in file_path for file_path in file_paths]
+    metadata["original_idx"] = [
+        get_original_index(file_idx, file_paths) for file_idx in range(len(file_paths))
+    ]
+    return metadata
+
+
+# Filter out the candidate pairs with the same document number and type and map the remaining pairs to the original files
+# This means we do not allow files to be compared with themselves or (paraphrased) versions of themselves
+# It is possible to compare a paraphrased file with the original file, we then want the index of the original file
+# @return a boolean mask of the kept pairs and the pairs (c1 <= c2) of original files of the kept pairs
+def map_to_original_pairs(candidate_pairs, metadata):
+    pairs = np.asarray(candidate_pairs, dtype=np.int64).reshape(-1, 2)
+    first = metadata[pairs[:, 0]]
+    second = metadata[pairs[:, 1]]
+
+    keep = (first["number"] != second["number"]) | (first["type"] != second["type"])
 
-    # Initialize a set to store the filtered pairs
-    filtered_pairs = set()
-
-    for pair in candidate_pairs:
-        # Get the file number and type for each file in the pair
-        file1_number, file1_type = get_file_details(pair[0])
-        file2_number, file2_type = get_file_details(pair[1])
+    # Make sure the smallest index is first
+    original_pairs = np.stack(
+        (first["original_idx"][keep], second["original_idx"][keep]), axis=1
+    )
+    original_pairs.sort(axis=1)
+    return keep, original_pairs
+
+
+# Filter the candidate pairs (see map_to_original_pairs), {metadata} is built from {file_paths} if it is not given
+# @return the filtered pairs as an (n, 2) int64 array, sorted and without duplicates
+def filter_pairs_by_number(candidate_pairs, file_paths, metadata=None):
+    if metadata is None:
+        metadata = document_metadata(file_paths)
+
+    _, original_pairs = map_to_original_pairs(candidate_pairs, metadata)
+    nr_docs = len(metadata)
+    return decode_pairs(np.unique(encode_pairs(original_pairs, nr_docs)), nr_docs)
+
+
+# Get the original index of a file if it is paraphrased
+# @return the index of the original file from which the file is paraphrased, or the index itself if it is not paraphrased
+def get_original_index(file_idx, file_paths):
+    file_path = file_paths[file_idx]
+    if PARAPHRASED in file_path:
+        # We always name the files: original_file_paraphrased_version.txt
+        # Paraphrased filepaths are structured as: assets/paraphrased/original_file/original_file_paraphrased_version.txt
+        # Therefore the last digit reflects the paraphrased version
+        paraphrase_version = int(file_path.split("/")[3].split(".txt")[0][-1])
+        # The index of the original file is the index of the paraphrased file minus the paraphrased version + 1 as we start counting from 0
+        return file_idx - (paraphrase_version + 1)
+    return file_idx
+
+
+# Take a random sample of about {ratio} of the documents, together with the file paths and fraud pairs of the sample.
+# Documents are sampled in groups which are never split up: a file stays together with its paraphrased versions
+# (their indices are derived from the index of the original file) and with the files it forms a fraud pair with.
+# The order of the documents is preserved and the fraud pairs are re-indexed to the sample.
+# @return the sampled documents, their file paths and the fraud pairs between them as an (n, 2) int64 array
+def subsample_documents(documents, file_paths, fraud_pairs, ratio, rng):
+    # Union-find over the documents, every group is represented by one of its documents
+    parent = list(range(len(documents)))
+
+    def find(idx):
+        while parent[idx] != idx:
+            parent[idx] = parent[parent[idx]]
+            idx = parent[idx]
+        return idx
+
+    def union(idx1, idx2):
+        parent[find(idx1)] = find(idx2)
+
+    for file_idx in range(len(file_paths)):
+        union(file_idx, get_original_index(file_idx, file_paths))
+    for pair in fraud_pairs:
+        union(pair[0], pair[1])
+
+    groups = {}
+    for file_idx in range(len(documents)):
+        groups.setdefault(find(file_idx), []).append(file_idx)
+    groups = list(groups.values())
+
+    # Add random groups to the sample until it holds enough documents
+    target_size = max(1, int(len(documents) * ratio))
+    sample = []
+    for group_idx in rng.permutation(len(groups)):
+        if len(sample) >= target_size:
+            break
+        sample.extend(groups[group_idx])
+    sample.sort()
+
+    # Map the indices of the sampled documents to their index in the sample
+    new_index = {file_idx: sample_idx for sample_idx, file_idx in enumerate(sample)}
+    sample_fraud_pairs = np.array(
+        [
+            (new_index[pair[0]], new_index[pair[1]])
+            for pair in fraud_pairs
+            if pair[0] in new_index and pair[1] in new_index
+        ],
+        dtype=np.int64,
+    ).reshape(-1, 2)
+
+    return (
+        [documents[file_idx] for file_idx in sample],
+        [file_paths[file_idx] for file_idx in sample],
+        sample_fraud_pairs,
+    )
 
-        # If the file numbers or types are different, add the pair to the filtered pairs.
-        # This means we do not allow files to be compared with themselves or (paraphrased) versions of themselves
-        if file1_number != file2_number or file1_type != file2_type:
-            # It is possible to compare a paraphrased file with the original file
-            # We then want to return the index of the original file rather than the paraphrased file for the candidate pairs
-            original_pair = original_idx(pair[0], pair[1], file_paths)
-            filtered_pairs.add(original_pair)
 
-    return filtered_pairs
+# Encode pairs of document indices (c1 < c2) into single int64 values, so that pair arrays can be de-duplicated
+# and compared with numpy's sorting-based set operations instead of Python sets of tuples
+# @return a 1D int64 array with one value per pair
+def encode_pairs(pairs, nr_docs):
+    pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+    return pairs[:, 0] * np.int64(nr_docs) + pairs[:, 1]
 
 
-# Get the original index of the files if they are paraphrased
-# @return the index of the original file from which the file is paraphrased (if one of the files is paraphrased)
-def original_idx(file1, file2, file_paths):
-    # Get the original index of the files if they are paraphrased
-    def get_original_index(file_idx):
-        file_path = file_paths[file_idx]
-        if PARAPHRASED in file_path:
-            # We always name the files: original_file_paraphrased_version.txt
-            # Paraphrased filepaths are structured as: assets/paraphrased/original_file/original_file_paraphrased_version.txt
-            # Therefore the last digit reflects the paraphrased version
-            paraphrase_version = int(file_path.split("/")[3].split(".txt")[0][-1])
-            # The index of the original file is the index of the paraphrased file minus the paraphrased version + 1 as we start counting from 0
-            return file_idx - (paraphrase_version + 1)
-        return file_idx
+# Convert pairs of document indices (an array, or a set or list of tuples) to an array
+# @return an (n, 2) int64 array of pairs
+def to_pair_array(pairs):
+    if isinstance(pairs, (set, frozenset)):
+        pairs = list(pairs)
+    return np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
 
-    # Get the original index for both files
-    original_file1_idx = get_original_index(file1)
-    original_file2_idx = get_original_index(file2)
 
-    # Make sure the smallest index is first
-    min_idx = min(original_file1_idx, original_file2_idx)
-    max_idx = max(original_file1_idx, original_file2_idx)
-    return (min_idx, max_idx)
+# Decode int64 values created by encode_pairs back into pairs of document indices
+# @return an (n, 2) int64 array of pairs
+def decode_pairs(codes, nr_docs):
+    codes = np.asarray(codes, dtype=np.int64)
+    return np.stack((codes // nr_docs, codes % nr_docs), axis=1)
 
 
 # Decorator to time the duration of a function and display the time taken
@@ -81,46 +194,39 @@ def timeit(method):
     return timed
 
 
-# Read the fraud pairs and return a new set containing the same fraud pairs, but with their corresponding indexes of the documents
-# which can be found in file_paths.
-# @return the fraud pairs with their corresponding indexes
+# Read the fraud pairs (pairs of file names) and link them to the indexes of the documents in file_paths.
+# A fraud pair is linked to the file and every paraphrased version of its first file, together with the (not paraphrased)
+# second file. The file paths are indexed by file name once, so every fraud pair is resolved with dictionary lookups.
+# @return the fraud pairs with their corresponding indexes as an (n, 2) int64 array, sorted and without duplicates
 def optimize_fraud_pair_indexing(fraud_pairs, file_paths):
+    # All indices of the files with a certain name (including the paraphrased versions), and only of the original files
+    name_to_indices = {}
+    name_to_original_indices = {}
+    for file_idx, file_path in enumerate(file_paths):
+        if PARAPHRASED in file_path:
+            # Paraphrased filepaths are structured as: assets/paraphrased/original_file/original_file_paraphrased_version.txt
+            name = os.path.basename(os.path.dirname(file_path))
+        else:
+            # Only strip the .txt extension, as in get_file_details (Foo.py.txt -> Foo.py)
+            name = os.path.basename(file_path).split(".txt")[0]
+            name_to_original_indices.setdefault(name, []).append(file_idx)
+        name_to_indices.setdefault(name, []).append(file_idx)
+
     # Now link the fraud pairs to the indexes of the document list
-    fraud_pairs_index = set()
+    fraud_pairs_index = []
     for fraud_pair in fraud_pairs:
         # Without the .txt extension
         original_file = fraud_pair[0].replace(".txt", "")
         fraud_file = fraud_pair[1].replace(".txt", "")
-        # Find in file_paths all occurrences of the original and fraud file
-        original_file_paths = set()
-        fraud_file_paths = set()
-
-        # In-case each file is paraphrased or not, we would need all occurrences of the original and fraud file
-        for file_path in file_paths:
-            if original_file in file_path:
-                original_file_paths.add(file_path)
-            if fraud_file in file_path:
-                fraud_file_paths.add(file_path)
-
-        # Now combine the original and fraud file paths
-        for original_file_path in original_file_paths:
-            # Filter out the paraphrased files
-            fraud_file_paths = [
-                file for file in fraud_file_paths if PARAPHRASED not in file
-            ]
-            for fraud_file_path in fraud_file_paths:
-                og_file_idx = file_paths.index(original_file_path)
-                fr_file_idx = file_paths.index(fraud_file_path)
-
-                min_idx = min(og_file_idx, fr_file_idx)
-                max_idx = max(og_file_idx, fr_file_idx)
-                fraud_pairs_index.add(
-                    (
-                        min_idx,
-                        max_idx,
-                    )
+
+        for og_file_idx in name_to_indices.get(original_file, []):
+            for fr_file_idx in name_to_original_indices.get(fraud_file, []):
+                fraud_pairs_index.append(
+                    (min(og_file_idx, fr_file_idx), max(og_file_idx, fr_file_idx))
                 )
-    return fraud_pairs_index
+
+    nr_docs = len(file_paths)
+    return decode_pairs(np.unique(encode_pairs(fraud_pairs_index, nr_docs)), nr_docs)
 
 
 # Convert an index to the corresponding file path for that document using the file_paths list
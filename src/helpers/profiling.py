@@ -0,0 +1,208 @@
+import os
+import sys
+import csv
+import json
+import time
+import cProfile
+from contextlib import contextmanager
+from src.constants import PROFILE_STAGES, PROFILE_HOT_PATHS
+
+try:
+    import resource
+except ImportError:  # The resource module is not available on Windows
+    resource = None
+
+
+# Peak resident set size (RSS) of this process so far. This is cumulative over the lifetime of the process,
+# so it does not tell how much memory a stage which runs after a more memory-hungry stage uses.
+# @return the peak RSS in MB, or None if it can not be measured on this platform
+def peak_rss_mb():
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return max_rss / (1024 * 1024) if sys.platform == "darwin" else max_rss / 1024
+
+
+# Current resident set size (RSS) of this process, read from /proc/self/statm
+# @return the current RSS in MB, or None if it can not be measured on this platform
+def current_rss_mb():
+    try:
+        with open("/proc/self/statm", "r") as file:
+            resident_pages = int(file.read().split()[1])
+    except (OSError, IndexError, ValueError):  # /proc is only available on Linux
+        return None
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+# CPU time of this process and of its finished child processes (e.g. the workers of a Pool that was closed)
+# @return the CPU time in seconds
+def cpu_time():
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+# Collects the wall time, CPU time, memory and number of processed items of every stage of the pipeline.
+# The memory of a stage is the current RSS at its entry and exit: "rss_mb" is the highest of these and "rss_change_mb"
+# the growth of the RSS during the stage. "process_peak_rss_mb" is the peak RSS of the process up to the end of the stage.
+# A stage can run multiple times (e.g. once per chunk), its measurements are then added up.
+# If {hot_paths} is set, every stage is also profiled with cProfile, so its hot paths can be inspected with pstats.
+class Profiler:
+    def __init__(self, hot_paths=PROFILE_HOT_PATHS):
+        self.hot_paths = hot_paths
+        self.stages = {}
+        self._profiles = {}
+        self._active_profile = None
+
+    # Measure the code within the with-block as a run of stage {name} which processes {items} items.
+    # The items can also be set within the block, through the "items" key of the yielded dictionary.
+    @contextmanager
+    def stage(self, name, items=None):
+        measurement = {"items": items}
+
+        # cProfile can not profile nested stages at the same time, a nested stage is part of the profile of its outer stage
+        profile = None
+        if self.hot_paths and self._active_profile is None:
+            profile = self._profiles.setdefault(name, cProfile.Profile())
+            self._active_profile = profile
+            profile.enable()
+
+        start_rss = current_rss_mb()
+        start_wall_time, start_cpu_time = time.perf_counter(), cpu_time()
+        try:
+            yield measurement
+        finally:
+            wall_time = time.perf_counter() - start_wall_time
+            stage_cpu_time = cpu_time() - start_cpu_time
+            end_rss = current_rss_mb()
+
+            if profile is not None:
+                profile.disable()
+                self._active_profile = None
+
+            self._add(
+                name,
+                {
+                    "calls": 1,
+                    "wall_time": wall_time,
+                    "cpu_time": stage_cpu_time,
+                    "rss_mb": (
+                        max(start_rss, end_rss) if end_rss is not None else None
+                    ),
+                    "rss_change_mb": (
+                        end_rss - start_rss if end_rss is not None else None
+                    ),
+                    "process_peak_rss_mb": peak_rss_mb(),
+                    "items": measurement["items"] or 0,
+                },
+            )
+
+    # Add the measurements of stage {name} in {record} to the measurements of this profiler
+    def _add(self, name, record):
+        stage = self.stages.setdefault(
+            name,
+            {
+                "calls": 0,
+                "wall_time": 0.0,
+                "cpu_time": 0.0,
+                "rss_mb": None,
+                "rss_change_mb": None,
+                "process_peak_rss_mb": None,
+                "items": 0,
+            },
+        )
+        for key in ("calls", "wall_time", "cpu_time", "items"):
+            stage[key] += record[key]
+        for key, combine in (
+            ("rss_mb", max),
+            ("rss_change_mb", lambda a, b: a + b),
+            ("process_peak_rss_mb", max),
+        ):
+            if record[key] is not None:
+                stage[key] = (
+                    record[key]
+                    if stage[key] is None
+                    else combine(stage[key], record[key])
+                )
+
+    # @return the raw measurements of all stages, e.g. to send them from a worker process to the main process
+    def records(self):
+        return {name: dict(stage) for name, stage in self.stages.items()}
+
+    # Add the measurements in {records} (e.g. from a worker process, see records()) to the measurements of this profiler
+    def merge(self, records):
+        for name, record in records.items():
+            self._add(name, record)
+
+    # Forget all measurements, e.g. at the start of a new run
+    def reset(self):
+        self.stages = {}
+        self._profiles = {}
+
+    # @return the measurements of all stages as a dictionary, with the throughput (items per second) of every stage
+    def report(self, run_name=None):
+        stages = {}
+        for name, stage in self.stages.items():
+            stages[name] = dict(stage)
+            stages[name]["items_per_second"] = (
+                stage["items"] / stage["wall_time"] if stage["wall_time"] > 0 else None
+            )
+        return {
+            "run": run_name,
+            "process_peak_rss_mb": peak_rss_mb(),
+            "stages": stages,
+        }
+
+    # Write the report of this run to {directory}/profile.json and append it as a row to the CSV file {csv_file}.
+    # The cProfile statistics of every stage are written to {directory}/profile_{stage}.prof
+    # @return the report
+    def save(self, directory, csv_file, run_name=None):
+        os.makedirs(directory, exist_ok=True)
+        report = self.report(run_name)
+
+        with open(
+            os.path.join(directory, "profile.json"), "w", encoding="utf-8"
+        ) as file:
+            json.dump(report, file, indent=4)
+
+        # Every run gets one row with the measurements of the stages in {PROFILE_STAGES}
+        write_header = not os.path.exists(csv_file)
+        with open(csv_file, "a", newline="", encoding="utf-8-sig") as file:
+            csv_writer = csv.writer(file)
+            if write_header:
+                csv_writer.writerow(
+                    ["Run"]
+                    + [
+                        f"{stage} {measurement}"
+                        for stage in PROFILE_STAGES
+                        for measurement in (
+                            "wall time (s)",
+                            "CPU time (s)",
+                            "RSS (MB)",
+                            "RSS change (MB)",
+                            "process peak RSS (MB)",
+                            "items",
+                        )
+                    ]
+                )
+            row = [run_name]
+            for stage in PROFILE_STAGES:
+                measurements = report["stages"].get(stage, {})
+                row += [
+                    measurements.get("wall_time"),
+                    measurements.get("cpu_time"),
+                    measurements.get("rss_mb"),
+                    measurements.get("rss_change_mb"),
+                    measurements.get("process_peak_rss_mb"),
+                    measurements.get("items"),
+                ]
+            csv_writer.writerow(row)
+
+        for name, profile in self._profiles.items():
+            profile.dump_stats(os.path.join(directory, f"profile_{name}.prof"))
+
+        return report
+
+
+# Profiler shared by the pipeline in this process
+profiler = Profiler()
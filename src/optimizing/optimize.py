@@ -5,7 +5,16 @@ from multiprocessing import Pool
 from src.evaluation.evaluation import plot_results, save_results_csv
 import numpy as np
 import gc
-from src.helpers.helper import timeit
+import math
+from src.helpers.profiling import profiler
+from src.helpers.helper import (
+    timeit,
+    subsample_documents,
+    document_metadata,
+    to_pair_array,
+)
+from src.LSH.similarity import exact_jaccard, candidate_probability
+from src.LSH.shingle import shingle_documents
 from tqdm import tqdm
 from src.constants import RANDOM_SEED
 
@@ -19,11 +28,32 @@ param_grid = {
 }
 
 
+# The corpus, ground truth, file paths and document metadata shared by all configurations.
+# These are set once per worker process by init_worker, so they are not sent along with every configuration.
+worker_data = {}
+
+
+# Initializer of the worker processes of the optimisation pool.
+# With the fork start method (default on Linux) the data is inherited from the parent process and not pickled at all.
+def init_worker(docs, ground_truth, file_paths):
+    worker_data["docs"] = docs
+    worker_data["ground_truth"] = ground_truth
+    worker_data["file_paths"] = file_paths
+    # Parse the file paths once, instead of for every candidate pair of every configuration
+    worker_data["metadata"] = document_metadata(file_paths)
+
+
 # Perform LSH with a certain hyperparameter configuration
-# @return the F1 score, precision, recall, false positives, false negatives, true positives, true negatives of the model
-def score_with_params(args):
-    # Unpack the arguments
-    docs, params, ground_truth, file_paths = args
+# @return the F1 score, params, precision, recall, false positives, false negatives, true positives, true negatives of the model,
+# and the profiler records of the stages that ran for this configuration (the worker's profiler is not seen by the main process)
+def score_with_params(params):
+    profiler.reset()
+
+    # Get the data shared by all configurations
+    docs = worker_data["docs"]
+    ground_truth = worker_data["ground_truth"]
+    file_paths = worker_data["file_paths"]
+    metadata = worker_data["metadata"]
 
     # Create the LSH model with the specified hyperparameters and score it
     model = LSHModel(**params)
@@ -35,13 +65,14 @@ def score_with_params(args):
         false_negatives,
         true_positives,
         true_negatives,
-    ) = model.score(docs, ground_truth, file_paths=file_paths)
+    ) = model.score(docs, ground_truth, file_paths=file_paths, metadata=metadata)
 
     # Clear all but f1, params
     del model
     del ground_truth
     del docs
     del file_paths
+    del metadata
     gc.collect()
 
     return (
@@ -53,6 +84,7 @@ def score_with_params(args):
         false_negatives,
         true_positives,
         true_negatives,
+        profiler.records(),
     )
 
 
@@ -61,11 +93,6 @@ def score_with_params(args):
 @timeit
 def optimize(docs, n_iter=3, fraud_pairs=None, file_paths=None):
     print("Starting optimisation process...")
-    best_f1 = 0  # Store the best F1 score found so far
-    best_params = None  # Corresponding best hyperparameters of best f1 score
-    f1_scores = []  # Store F1 scores
-    param_combinations = []  # Store parameter combinations
-    results = []  # Store results
 
     # Use numpy's random number generator to ensure reproducibility
     # Create the random number generator with the specified seed
@@ -77,14 +104,72 @@ def optimize(docs, n_iter=3, fraud_pairs=None, file_paths=None):
         ParameterSampler(param_grid, n_iter=n_iter, random_state=random_state)
     )
 
-    del rng
     del random_state
 
-    # Prepare the arguments for parallel execution
-    args_list = [
-        (docs, params, fraud_pairs, file_paths) for params in param_sampler
-    ]  # Include fraud_pairs & file paths in each tuple
-    with Pool(processes=AMOUNT_OF_WORKERS) as pool:
+    # Prune configurations which are not expected to perform well, before any MinHash work is done
+    if PRESCREEN_CONFIGURATIONS and fraud_pairs is not None and len(fraud_pairs) > 0:
+        param_sampler = prescreen_configurations(
+            docs, param_sampler, fraud_pairs, file_paths, rng=rng
+        )
+
+    if OPTIMISATION_STRATEGY == "halving":
+        results = successive_halving(
+            docs, param_sampler, fraud_pairs, file_paths, rng=rng
+        )
+    else:
+        results = evaluate_configurations(docs, param_sampler, fraud_pairs, file_paths)
+
+    del rng
+
+    # The best configuration is the first one (in order of completion) with the highest F1 score
+    best_f1 = 0  # Store the best F1 score found so far
+    best_params = None  # Corresponding best hyperparameters of best f1 score
+    for f1, params, *_ in results:
+        if f1 > best_f1:
+            best_f1 = f1
+            best_params = params
+
+    if not best_params:
+        print("No optimal hyperparameters found")
+        return
+
+    # Sort the results by F1 score in descending order
+    sorted_results = sorted(results, key=lambda x: x[0], reverse=True)
+    top_results = sorted_results[:TOP_VALUES]
+
+    # Save the results to a CSV file and plot the top {TOP_VALUES} results
+    save_results_csv(results)
+    plot_results(top_results)
+    return best_params, best_f1
+
+
+# Score every configuration in {param_list} on the given documents, in parallel
+# @return a list with, for every configuration, the F1 score, params, precision, recall, false positives, false negatives, true positives, true negatives
+def evaluate_configurations(docs, param_list, fraud_pairs, file_paths):
+    best_f1 = 0  # Store the best F1 score found so far
+    results = []  # Store results
+
+    # Order the configurations by their shingle parameters, so configurations which share shingles and signatures
+    # (and only differ in n_hash, n_bands or K) are handed to the same worker and hit its signature cache.
+    # With NESTED_HASHING a worker computes one signature per shingle configuration and reuses it for every n_hash.
+    param_list = sorted(
+        param_list, key=lambda params: (params["shingle_size"], params["window_step"])
+    )
+    configurations_per_shingle = len(N_HASH) * len(N_BANDS) * len(K)
+    chunksize = max(
+        1,
+        min(
+            configurations_per_shingle,
+            len(param_list) // (4 * AMOUNT_OF_WORKERS),
+        ),
+    )
+
+    # Only the parameters are sent with each task, the documents, fraud_pairs & file paths are given to each worker once
+    with Pool(
+        processes=AMOUNT_OF_WORKERS,
+        initializer=init_worker,
+        initargs=(docs, fraud_pairs, file_paths),
+    ) as pool:
         # Process results as soon as they are available
         for (
             f1,
@@ -95,12 +180,15 @@ def optimize(docs, n_iter=3, fraud_pairs=None, file_paths=None):
             false_negatives,
             true_positives,
             true_negatives,
+            profiler_records,
         ) in tqdm(
-            pool.imap_unordered(score_with_params, args_list), total=len(args_list)
-        ):  # Iterate over the results and update the best F1 score if a better one is found
+            pool.imap_unordered(score_with_params, param_list, chunksize=chunksize),
+            total=len(param_list),
+        ):  # Iterate over the results and report when a better F1 score is found
+            profiler.merge(profiler_records)
+
             if f1 > best_f1:
                 best_f1 = f1
-                best_params = params
                 tqdm.write(f"New Best F1: {f1} with Params: {params}")
 
             # Continue to append results to keep track of all iterations
@@ -116,18 +204,119 @@ def optimize(docs, n_iter=3, fraud_pairs=None, file_paths=None):
                     true_negatives,
                 )
             )
-            f1_scores.append(f1)
-            param_combinations.append(params)
 
-    if not best_params:
-        print("No optimal hyperparameters found")
-        return
+    return results
 
-    # Sort the results by F1 score in descending order
-    sorted_results = sorted(results, key=lambda x: x[0], reverse=True)
-    top_results = sorted_results[:TOP_VALUES]
 
-    # Save the results to a CSV file and plot the top {TOP_VALUES} results
-    save_results_csv(results)
-    plot_results(top_results)
-    return best_params, best_f1
+# Successive halving: score all configurations on a small sample of the documents, keep the best 1/{HALVING_ETA}
+# of them and repeat with a {HALVING_ETA} times larger sample, until the remaining configurations are scored on all documents.
+# Most configurations are therefore only scored on a small sample, which is much cheaper than scoring them on the full corpus.
+# @return the results of the configurations which made it to the final round (scored on all documents)
+def successive_halving(docs, param_list, fraud_pairs, file_paths, rng):
+    sample_ratio = HALVING_MIN_SAMPLE_RATIO
+
+    while sample_ratio < 1 and len(param_list) > 1:
+        sample_docs, sample_file_paths, sample_fraud_pairs = subsample_documents(
+            docs, file_paths, fraud_pairs, sample_ratio, rng
+        )
+        print(
+            f"Successive halving: scoring {len(param_list)} configurations on {len(sample_docs)} documents"
+        )
+        results = evaluate_configurations(
+            sample_docs, param_list, sample_fraud_pairs, sample_file_paths
+        )
+
+        # Keep the best configurations for the next round
+        results.sort(key=lambda x: x[0], reverse=True)
+        keep = max(1, math.ceil(len(results) / HALVING_ETA))
+        param_list = [params for _, params, *_ in results[:keep]]
+        sample_ratio *= HALVING_ETA
+
+    print(
+        f"Successive halving: scoring {len(param_list)} configurations on all {len(docs)} documents"
+    )
+    return evaluate_configurations(docs, param_list, fraud_pairs, file_paths)
+
+
+# Analytic pre-screening of the configurations. Two documents with Jaccard similarity s become a candidate pair with
+# probability 1 - (1 - s^r)^b, with b = n_bands and r = n_hash / n_bands. Using the exact Jaccard similarities of a sample of
+# fraud and non-fraud pairs, the expected true positives, false positives and false negatives (and thus F1 score) of each
+# configuration are computed without running it. Collisions of the band hashes in the K buckets are not taken into account.
+# @return the configurations with an expected F1 score of at least {PRESCREEN_F1_RATIO} times the best expected F1 score
+def prescreen_configurations(docs, param_list, fraud_pairs, file_paths, rng):
+    fraud_pairs = to_pair_array(fraud_pairs)
+    sampled_fraud_pairs = fraud_pairs[
+        rng.permutation(len(fraud_pairs))[:PRESCREEN_SAMPLE_PAIRS]
+    ]
+    non_fraud_pairs = sample_non_fraud_pairs(fraud_pairs, file_paths, rng)
+
+    total_pairs = len(docs) * (len(docs) - 1) // 2
+    total_non_fraud_pairs = total_pairs - len(fraud_pairs)
+
+    # The similarities only depend on the shingle parameters, so they are computed once per shingle size and window step
+    similarities = {}
+    for shingle_size, window_step in {
+        (params["shingle_size"], params["window_step"]) for params in param_list
+    }:
+        shingles = shingle_documents(
+            documents=docs, shingle_size=shingle_size, window_step=window_step
+        )
+        similarities[(shingle_size, window_step)] = (
+            exact_jaccard(shingles, sampled_fraud_pairs),
+            exact_jaccard(shingles, non_fraud_pairs),
+        )
+        del shingles
+
+    expected_f1_scores = []
+    for params in param_list:
+        fraud_similarity, non_fraud_similarity = similarities[
+            (params["shingle_size"], params["window_step"])
+        ]
+        rows = params["n_hash"] // params["n_bands"]
+
+        # Expected number of fraud pairs that are found, and of non-fraud pairs that are wrongly found
+        true_positives = len(fraud_pairs) * np.mean(
+            candidate_probability(fraud_similarity, rows, params["n_bands"])
+        )
+        false_positives = (
+            total_non_fraud_pairs
+            * np.mean(
+                candidate_probability(non_fraud_similarity, rows, params["n_bands"])
+            )
+            if len(non_fraud_similarity) > 0
+            else 0
+        )
+        false_negatives = len(fraud_pairs) - true_positives
+
+        expected_f1_scores.append(
+            2
+            * true_positives
+            / (2 * true_positives + false_positives + false_negatives)
+        )
+
+    threshold = PRESCREEN_F1_RATIO * max(expected_f1_scores)
+    kept = [
+        params
+        for params, expected_f1 in zip(param_list, expected_f1_scores)
+        if expected_f1 >= threshold
+    ]
+    print(
+        f"Pre-screening: kept {len(kept)} of {len(param_list)} configurations with an expected F1 score of at least {threshold}"
+    )
+    return kept
+
+
+# Sample random pairs of documents which are not fraud pairs and are not (paraphrased) versions of the same file
+# @return the sampled pairs as an (n, 2) int64 array
+def sample_non_fraud_pairs(fraud_pairs, file_paths, rng):
+    original_indices = document_metadata(file_paths)["original_idx"]
+    fraud_pair_set = set(map(tuple, fraud_pairs.tolist()))
+
+    pairs = rng.integers(0, len(file_paths), size=(PRESCREEN_SAMPLE_PAIRS, 2))
+    pairs.sort(axis=1)
+    pairs = pairs[original_indices[pairs[:, 0]] != original_indices[pairs[:, 1]]]
+
+    return np.array(
+        [pair for pair in pairs.tolist() if tuple(pair) not in fraud_pair_set],
+        dtype=np.int64,
+    ).reshape(-1, 2)
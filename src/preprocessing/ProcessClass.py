@@ -4,6 +4,13 @@ import string
 import contractions
 from tokenize_all import Java
 import re
+import io
+import keyword
+import tokenize
+
+# Token types of the parts of an f-string (Python 3.12+), which do not exist in older versions
+FSTRING_START = getattr(tokenize, "FSTRING_START", None)
+FSTRING_END = getattr(tokenize, "FSTRING_END", None)
 
 
 class ProcessClass:
@@ -17,16 +24,79 @@ class ProcessClass:
         pass
 
 
+# Token of code with its type (e.g. "identifier") and value (e.g. "my_variable"), like the tokens of tokenize_all
+class CodeToken:
+    def __init__(self, type, value):
+        self.type = type
+        self.value = value
+
+    def __str__(self):
+        return f"{self.type}: {self.value}"
+
+
 class CodePreprocessor(ProcessClass):
     # Need to know the programming language to preprocess code
     def __init__(self, data, language):
         super().__init__(data)
         self.language = language
 
+    # Tokenize Python code with the tokenize module of the standard library.
+    # Identifiers and literals get the same token types as the Java tokens (see TOKEN_TYPES), and the structure of the
+    # code is kept with the same types as in Java: a new statement is a "semicolon" and indentation is a "left/right brace".
+    # Comments and blank lines are removed.
+    # @return: list of CodeTokens
     def python_preprocess(self):
-        pass
+        tokens = []
+        previous_name = None
+        fstring_depth = 0
+
+        try:
+            for token in tokenize.generate_tokens(io.StringIO(self.data).readline):
+                # An f-string is split into multiple tokens (Python 3.12+), it is kept as a single string
+                if token.type == FSTRING_START:
+                    if fstring_depth == 0:
+                        tokens.append(CodeToken("string", token.string))
+                    fstring_depth += 1
+                    continue
+                if fstring_depth > 0:
+                    fstring_depth -= token.type == FSTRING_END
+                    continue
+
+                if token.type == tokenize.NAME:
+                    if token.string in ("True", "False", "None"):
+                        token_type = "keyword literal"
+                    elif keyword.iskeyword(token.string):
+                        token_type = "keyword"
+                    elif previous_name == "def":
+                        token_type = "function"
+                    elif previous_name == "class":
+                        token_type = "class name"
+                    else:
+                        token_type = "identifier"
+                    previous_name = token.string
+                    tokens.append(CodeToken(token_type, token.string))
+                    continue
+
+                previous_name = None
+                if token.type == tokenize.STRING:
+                    tokens.append(CodeToken("string", token.string))
+                elif token.type == tokenize.NUMBER:
+                    tokens.append(CodeToken("number", token.string))
+                elif token.type == tokenize.OP:
+                    tokens.append(CodeToken("operator", token.string))
+                elif token.type == tokenize.NEWLINE:
+                    tokens.append(CodeToken("semicolon", ";"))
+                elif token.type == tokenize.INDENT:
+                    tokens.append(CodeToken("left brace", "{"))
+                elif token.type == tokenize.DEDENT:
+                    tokens.append(CodeToken("right brace", "}"))
+                elif token.type == tokenize.ERRORTOKEN and not token.string.isspace():
+                    tokens.append(CodeToken("operator", token.string))
+        except (tokenize.TokenError, SyntaxError):
+            # Keep the tokens up to the error, e.g. for a file with unbalanced brackets or a broken indentation
+            pass
 
-    done = False
+        return tokens
 
     def java_preprocess(self):
         # Remove comments
@@ -41,7 +111,8 @@ class CodePreprocessor(ProcessClass):
 
     def process(self):
         if self.language == "python":
-            self.python_preprocess()
+            self.processed_data = self.python_preprocess()
+            return self.processed_data
         elif self.language == "java":
             self.processed_data = self.java_preprocess()
             return self.processed_data
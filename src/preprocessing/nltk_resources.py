@@ -0,0 +1,39 @@
+from functools import lru_cache
+from nltk.stem import WordNetLemmatizer
+from nltk.corpus import stopwords
+from nltk.data import find
+import nltk
+
+# The NLTK resources are only downloaded and loaded on first use, so importing src.constants (and the LSH engine) does
+# not depend on NLTK. Each function loads its resource once per process.
+
+
+def download_nltk_resource(package_id, resource_name):
+    try:
+        # See if available
+        find(resource_name)
+    except Exception:
+        # Not found so download the resource
+        nltk.download(package_id, quiet=True)
+
+
+# Download resources if not available
+@lru_cache(maxsize=None)
+def ensure_nltk_resources():
+    download_nltk_resource("stopwords", "corpora/stopwords")
+    download_nltk_resource("wordnet", "corpora/wordnet")
+    download_nltk_resource("punkt", "tokenizers/punkt")
+
+
+# @return the set of English stopwords
+@lru_cache(maxsize=None)
+def get_stopwords():
+    ensure_nltk_resources()
+    return set(stopwords.words("english"))
+
+
+# @return the WordNet lemmatiser
+@lru_cache(maxsize=None)
+def get_lemmatiser():
+    ensure_nltk_resources()
+    return WordNetLemmatizer()
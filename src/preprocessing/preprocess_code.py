@@ -1,4 +1,5 @@
 from src.preprocessing.ProcessClass import CodePreprocessor
+from src.preprocessing.preprocessing_cache import preprocessing_cache
 from src.constants import *
 from src.common import *
 
@@ -8,32 +9,44 @@ def preprocess(data, language):
     return preprocess_class.process()
 
 
-def paraphrase_token(token):
-    if token.type in TOKEN_TYPES:
-        token.value = token.type
-    return token
+# Convert the (type, value) tokens of a file to a document for the LSH model: a stream of tokens separated by spaces,
+# so the word-based shingles of the document are n-grams of tokens.
+# Tokens with a type in {normalized_token_types} are replaced by their type, the other tokens keep their value.
+# @return the document as a string
+def tokens_to_document(tokens, normalized_token_types=NORMALIZED_TOKEN_TYPES):
+    document_tokens = []
+    for token_type, value in tokens:
+        token = token_type if token_type in normalized_token_types else value
+        # A token must not contain whitespace, as it would be split into multiple tokens
+        token = "_".join(token.split())
+        if token:
+            document_tokens.append(token)
+    return " ".join(document_tokens)
 
 
 def paraphrase(preprocessed_tokens, full_file_name):
-    # Remove file extension
-    file_name = full_file_name.split(".")[0]
+    # Keep the file extension, so e.g. Foo.py and Foo.java do not share their paraphrased versions
+    file_name = full_file_name
 
     # Target file path
     target_paraphrased_directory_path = PARAPHRASED_DIR + f"{file_name}"
     create_dir_if_not_exists(target_paraphrased_directory_path)
 
+    # Initialize the results
+    results = []
+
     # Paraphrase the data 5 different times for 5 different results
     for i in range(PARAPHRASE_COUNT):
-
-        # TODO - Paraphrase the data
-        for token in preprocessed_tokens:
-            token = paraphrase_token(token)
-
-        tokens = [token.value for token in preprocessed_tokens]
+        # Every token with a type in TOKEN_TYPES (including the keywords) is replaced by its type
+        paraphrased_data = tokens_to_document(preprocessed_tokens, TOKEN_TYPES)
         target_file_path_code = (
             f"{target_paraphrased_directory_path}/{file_name}_{PARAPHRASED}_{i}.txt"
         )
-        write_to_file(target_file_path_code, " ".join(tokens))
+        write_to_file(target_file_path_code, paraphrased_data)
+
+        results.append((paraphrased_data, target_file_path_code))
+
+    return results
 
 
 def rebuild_code(tokens):
@@ -59,27 +72,28 @@ def rebuild_code(tokens):
     return code
 
 
-def save_preprocessed_data(preprocessed_tokens, target_file_path):
-    tokens = [str(token) for token in preprocessed_tokens]
-    code_target_file_path = target_file_path.replace(
-        get_file_extension(target_file_path), ".txt"
-    )
-    write_to_file(code_target_file_path, "\n".join(tokens))
-
-
 def process_single_code_file(file_path, language, data, full_file_name):
-    # Perform preprocessing steps
-    preprocessed_tokenised_data = preprocess(data, language)
+    # Get the target file path, the preprocessed code is saved as a text file.
+    # The extension of the source file is kept (Foo.py -> Foo.py.txt), so files which only differ in their language do not collide.
+    target_file_path = file_path.replace(DATASET_DIR, PREPROCESSED_DIR) + ".txt"
 
-    # Get the target file path
-    target_file_path = file_path.replace(DATASET_DIR, PREPROCESSED_DIR)
-
-    preprocessed_tokens = [token for token in preprocessed_tokenised_data]
+    # The tokens only depend on the content and the language, so reuse them if this file was tokenized before
+    cache_key = preprocessing_cache.key(
+        data, ("code", language, PREPROCESSING_CACHE_VERSION)
+    )
+    preprocessed_tokens = preprocessing_cache.get(cache_key)
+    if preprocessed_tokens is None:
+        # Perform preprocessing steps
+        preprocessed_tokens = [
+            (token.type, token.value) for token in preprocess(data, language)
+        ]
+        preprocessing_cache.put(cache_key, preprocessed_tokens)
 
     # Save the preprocessed data
-    save_preprocessed_data(preprocessed_tokens, target_file_path)
+    result = tokens_to_document(preprocessed_tokens)
+    write_to_file(target_file_path, result)
 
     # Paraphrase the data
-    paraphrase(preprocessed_tokens, full_file_name)
+    paraphrased = paraphrase(preprocessed_tokens, full_file_name)
 
-    return data
+    return [(result, target_file_path)] + paraphrased
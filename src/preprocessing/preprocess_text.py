@@ -1,10 +1,13 @@
 from src.preprocessing.ProcessClass import TextPreprocessor
+from src.preprocessing.preprocessing_cache import preprocessing_cache
+from src.preprocessing.nltk_resources import get_stopwords, get_lemmatiser
+from src.preprocessing.synonym_cache import synonym_cache
 from nltk.corpus import wordnet
-from collections import defaultdict
 from src.constants import *
 from src.common import *
 import random
 from rake_nltk import Rake
+import nltk
 
 # Use seed for reproducibility
 random.seed(RANDOM_SEED)
@@ -43,49 +46,52 @@ class CustomRake(Rake):
         return document_keywords
 
 
-def preprocess(data):
-    # Initialize the Rake object
-    rake_object = CustomRake()
+# The NLTK and RAKE resources used to preprocess text.
+# These are loaded once per (worker) process by load_text_resources, instead of once per document.
+text_resources = {}
 
-    preprocess_class = TextPreprocessor(data, set_of_stopwords, lemmatiser, rake_object)
-    return preprocess_class.process()
 
+# Load the stopwords, lemmatiser, RAKE object and WordNet, this is the initializer of the preprocessing pool
+def load_text_resources():
+    text_resources["stopwords"] = get_stopwords()
+    text_resources["lemmatiser"] = get_lemmatiser()
+    text_resources["rake"] = CustomRake(text_resources["stopwords"])
 
-# Cache the synonyms to avoid repeated calls to the WordNet API
-synonyms_cache = defaultdict(list)
+    # NLTK loads WordNet and the tokenizer models on first use, load them now so the first document does not pay for it
+    wordnet.ensure_loaded()
+    nltk.word_tokenize("Load the tokenizer.")
 
 
-# Get synonyms for a word
-def get_synonyms(word):
-    synonyms = {
-        lemma.name().replace("_", " ")
-        for syn in wordnet.synsets(word)
-        for lemma in syn.lemmas()
-        if "_" not in (synonym := lemma.name().replace("_", " ")) and synonym != word
-    }
-    return list(synonyms)
+def preprocess(data):
+    if not text_resources:
+        load_text_resources()
+
+    preprocess_class = TextPreprocessor(
+        data,
+        text_resources["stopwords"],
+        text_resources["lemmatiser"],
+        text_resources["rake"],
+    )
+    return preprocess_class.process()
 
 
-# Paraphrase the keywords
-def paraphrase_keywords(words):
+# Paraphrase the keywords, the random choices are made with {rng}
+def paraphrase_keywords(words, rng=random):
     transformed_keywords = []
 
     for keyword in words:
-        if random.random() >= PARAPHRASE_THRESHOLD:
+        if rng.random() >= PARAPHRASE_THRESHOLD:
             transformed_keywords.append(keyword)
         else:
-            synonyms = synonyms_cache[keyword]
-            if not synonyms:
-                synonyms = get_synonyms(keyword)
-                synonyms_cache[keyword] = synonyms
-            synonym = random.choice(synonyms) if synonyms else keyword
+            synonyms = synonym_cache.get(keyword)
+            synonym = rng.choice(synonyms) if synonyms else keyword
             transformed_keywords.append(synonym.lower())
 
     return transformed_keywords
 
 
-# Paraphrase the document
-def paraphrase(data, full_file_name):
+# Paraphrase the document with keywords {data}, which were extracted from the file content {source_data}
+def paraphrase(data, full_file_name, source_data):
     # Remove file extension
     file_name = full_file_name.split(".")[0]
 
@@ -101,15 +107,29 @@ def paraphrase(data, full_file_name):
         target_file_path = (
             f"{target_paraphrased_directory_path}/{file_name}_{PARAPHRASED}_{i}.txt"
         )
-        paraphrased_data = None
-        # If it already exists, read it in
-        if os.path.exists(target_file_path):
-            with open(target_file_path, "r", encoding="utf-8-sig") as file:
-                paraphrased_data = file.read()
-        else:
-            paraphrased_data = paraphrase_keywords(data)
-            paraphrased_data = convert_to_string(paraphrased_data)
-            write_to_file(target_file_path, paraphrased_data)
+
+        # A paraphrased version only depends on the content, the preprocessing settings and the paraphrase settings,
+        # so reuse it if it was made with the same settings before (WORD_BASED is applied afterwards)
+        cache_key = preprocessing_cache.key(
+            source_data,
+            (
+                "paraphrase",
+                KEYWORD_SELECTION_RATIO[0],
+                PARAPHRASE_THRESHOLD,
+                i,
+                PREPROCESSING_CACHE_VERSION,
+            ),
+        )
+        paraphrased_keywords = preprocessing_cache.get(cache_key)
+        if paraphrased_keywords is None:
+            # Seed the random choices with the key, so a version does not depend on the order in which files are processed
+            paraphrased_keywords = paraphrase_keywords(
+                data, rng=random.Random(cache_key)
+            )
+            preprocessing_cache.put(cache_key, paraphrased_keywords)
+
+        paraphrased_data = convert_to_string(paraphrased_keywords)
+        write_to_file(target_file_path, paraphrased_data)
 
         results.append((paraphrased_data, target_file_path))
 
@@ -133,25 +153,27 @@ def convert_to_string(paraphrased_data):
 def process_single_text_file(file_path, data, full_file_name):
     # Get the target file path
     target_file_path = file_path.replace(DATASET_DIR, PREPROCESSED_DIR)
-    # Initialize the result
-    preprocessed_tokenised_data = None
 
-    # Check if the target_file_path exists, if so, load it in
-    if os.path.exists(target_file_path):
-        with open(target_file_path, "r", encoding="utf-8-sig") as file:
-            result = file.read()
-    else:
+    # The keywords only depend on the content and the keyword selection ratio (WORD_BASED is applied afterwards),
+    # so reuse them if this document was preprocessed with the same settings before
+    cache_key = preprocessing_cache.key(
+        data, ("text", KEYWORD_SELECTION_RATIO[0], PREPROCESSING_CACHE_VERSION)
+    )
+    preprocessed_tokenised_data = preprocessing_cache.get(cache_key)
+    if preprocessed_tokenised_data is None:
         # Perform preprocessing steps
         preprocessed_tokenised_data = preprocess(data)
-        # Save the preprocessed data
-        result = convert_to_string(preprocessed_tokenised_data)
-        # Write the preprocessed data to the target file path
-        write_to_file(target_file_path, result)
+        preprocessing_cache.put(cache_key, preprocessed_tokenised_data)
+
+    # Save the preprocessed data
+    result = convert_to_string(preprocessed_tokenised_data)
+    # Write the preprocessed data to the target file path
+    write_to_file(target_file_path, result)
 
     paraphrased = []
 
     # Paraphrase the data if full_full_name contains a string from SUSPICIOUS_TERMS
     if any(term in full_file_name for term in SUSPICIOUS_TERMS):
-        paraphrased = paraphrase(preprocessed_tokenised_data, full_file_name)
+        paraphrased = paraphrase(preprocessed_tokenised_data, full_file_name, data)
 
     return [(result, target_file_path)] + paraphrased
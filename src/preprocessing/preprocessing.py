@@ -2,8 +2,13 @@ from multiprocessing import Pool
 from src.constants import *
 from src.common import *
 import re
-from src.preprocessing.preprocess_text import process_single_text_file
+from src.preprocessing.preprocess_text import (
+    process_single_text_file,
+    load_text_resources,
+)
 from src.preprocessing.preprocess_code import process_single_code_file
+from src.preprocessing.preprocessing_cache import preprocessing_cache
+from src.preprocessing.synonym_cache import synonym_cache
 
 
 def determine_file_type(data, full_file_name):
@@ -75,11 +80,33 @@ def process_single_file(file_path):
     return data
 
 
+# Process a single file in a worker process
+# @return the results of the file and the preprocessing cache entries that were added in this worker
+def process_single_file_cached(file_path):
+    results = process_single_file(file_path)
+    # Share the synonyms that were looked up for this file with the other workers
+    synonym_cache.flush()
+    return results, preprocessing_cache.pop_pending()
+
+
 # Start the preprocessing
 def start_preprocessing(file_paths):
 
-    with Pool(processes=AMOUNT_OF_WORKERS) as pool:
-        nested_results = pool.map(process_single_file, file_paths)
+    # Hand the files to the workers in batches, so a worker is not sent a new task for every single file
+    chunksize = max(1, len(file_paths) // (4 * AMOUNT_OF_WORKERS))
+
+    # The NLTK and RAKE resources are loaded once per worker process, not once per file
+    with Pool(processes=AMOUNT_OF_WORKERS, initializer=load_text_resources) as pool:
+        worker_results = pool.map(
+            process_single_file_cached, file_paths, chunksize=chunksize
+        )
+
+    # The workers only read the preprocessing cache, the new entries are written by this process
+    nested_results = []
+    for file_results, cache_entries in worker_results:
+        nested_results.append(file_results)
+        preprocessing_cache.update(cache_entries)
+    preprocessing_cache.flush()
 
     # Flatten the list of lists into a single list of tuples
     results = [item for sublist in nested_results for item in sublist]
@@ -0,0 +1,104 @@
+import os
+import pickle
+import hashlib
+from src.constants import PREPROCESSING_CACHE_DIR
+from src.common import create_dir_if_not_exists
+
+
+# Cache for preprocessing results, keyed by the hash of the source content and the preprocessing configuration.
+# Unlike the files in PREPROCESSED_DIR, an entry is only reused if the document and the settings it was made with are unchanged,
+# so runs which only differ in e.g. KEYWORD_SELECTION_RATIO reuse every document that was preprocessed with the same settings.
+# Entries are stored in {cache_dir} in shards (one pickle file per first byte of the key), which are read lazily.
+# New entries are kept as pending until flush() is called, so that only one process has to write the shards.
+class PreprocessingCache:
+    def __init__(self, cache_dir=PREPROCESSING_CACHE_DIR):
+        self.cache_dir = cache_dir
+        # Loaded shards: shard name -> {key: value}
+        self._shards = {}
+        # Entries that are not written to disk yet
+        self._pending = {}
+
+    # Compute the key of a document with content {data}, preprocessed with the settings in {config}
+    # @return the key as a hex string
+    @staticmethod
+    def key(data, config):
+        key = hashlib.sha1(repr(config).encode("utf-8"))
+        key.update(data.encode("utf-8"))
+        return key.hexdigest()
+
+    # @return the cached value of {key}, or None if the key is not cached
+    def get(self, key):
+        return self._load_shard(self._shard_name(key)).get(key)
+
+    # Store {value} under {key}, it is written to disk on the next flush()
+    def put(self, key, value):
+        self._load_shard(self._shard_name(key))[key] = value
+        self._pending[key] = value
+
+    # Take the entries that were added since the last call, e.g. to send them from a worker process to the main process
+    # @return a dictionary with the pending entries
+    def pop_pending(self):
+        pending = self._pending
+        self._pending = {}
+        return pending
+
+    # Add entries (e.g. from a worker process) to the cache
+    def update(self, entries):
+        for key, value in entries.items():
+            self.put(key, value)
+
+    # Write the pending entries to their shards on disk
+    def flush(self):
+        pending = self.pop_pending()
+        if not self.cache_dir or not pending:
+            return
+
+        create_dir_if_not_exists(self.cache_dir)
+
+        shards = {}
+        for key, value in pending.items():
+            shards.setdefault(self._shard_name(key), {})[key] = value
+
+        for shard_name, entries in shards.items():
+            # Merge with the shard on disk, it can contain entries written by another run since it was loaded
+            shard = self._read_shard(shard_name)
+            shard.update(entries)
+            self._shards[shard_name] = shard
+
+            # Write to a temporary file first, so a shard is never half-written
+            file_path = self._file_path(shard_name)
+            temp_file_path = f"{file_path}.{os.getpid()}.tmp"
+            with open(temp_file_path, "wb") as file:
+                pickle.dump(shard, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_file_path, file_path)
+
+    def _load_shard(self, shard_name):
+        if shard_name not in self._shards:
+            self._shards[shard_name] = self._read_shard(shard_name)
+        return self._shards[shard_name]
+
+    def _read_shard(self, shard_name):
+        if not self.cache_dir:
+            return {}
+
+        file_path = self._file_path(shard_name)
+        if not os.path.exists(file_path):
+            return {}
+
+        try:
+            with open(file_path, "rb") as file:
+                return pickle.load(file)
+        except Exception:
+            # An unreadable shard is treated as empty, it will be overwritten on the next flush
+            return {}
+
+    @staticmethod
+    def _shard_name(key):
+        return key[:2]
+
+    def _file_path(self, shard_name):
+        return os.path.join(self.cache_dir, shard_name + ".pkl")
+
+
+# Cache shared by the preprocessing in this process
+preprocessing_cache = PreprocessingCache()
@@ -0,0 +1,94 @@
+import os
+import sqlite3
+from nltk.corpus import wordnet
+from src.constants import SYNONYM_CACHE_FILE
+from src.common import create_dir_if_not_exists
+from src.preprocessing.nltk_resources import ensure_nltk_resources
+
+
+# Get synonyms for a word from WordNet
+# @return the sorted list of synonyms, so that a seeded random choice always picks the same synonym
+def get_synonyms(word):
+    ensure_nltk_resources()
+    synonyms = {
+        lemma.name().replace("_", " ")
+        for syn in wordnet.synsets(word)
+        for lemma in syn.lemmas()
+        if "_" not in (synonym := lemma.name().replace("_", " ")) and synonym != word
+    }
+    return sorted(synonyms)
+
+
+# Synonym lookup which is shared between the worker processes and persisted between runs.
+# The synonyms of a word are looked up in an in-process dictionary, then in an SQLite database in {cache_file},
+# and only then in WordNet. Words without synonyms are stored as well, so WordNet is asked only once for every word.
+# New entries are written to the database on flush(), SQLite takes care of concurrent readers and writers.
+class SynonymCache:
+    def __init__(self, cache_file=SYNONYM_CACHE_FILE):
+        self.cache_file = cache_file
+        self._synonyms = {}
+        self._pending = {}
+        self._connection = None
+        self._connection_pid = None
+
+    # @return the (sorted) synonyms of {word}, an empty list if it has none
+    def get(self, word):
+        synonyms = self._synonyms.get(word)
+        if synonyms is not None:
+            return synonyms
+
+        synonyms = self._read(word)
+        if synonyms is None:
+            synonyms = get_synonyms(word)
+            self._pending[word] = synonyms
+
+        self._synonyms[word] = synonyms
+        return synonyms
+
+    # Write the synonyms that were looked up in WordNet since the last flush to the database
+    def flush(self):
+        connection = self._connect()
+        if connection is None or not self._pending:
+            self._pending = {}
+            return
+
+        with connection:
+            connection.executemany(
+                "INSERT OR IGNORE INTO synonyms (word, synonyms) VALUES (?, ?)",
+                [
+                    (word, "\n".join(synonyms))
+                    for word, synonyms in self._pending.items()
+                ],
+            )
+        self._pending = {}
+
+    def _read(self, word):
+        connection = self._connect()
+        if connection is None:
+            return None
+
+        row = connection.execute(
+            "SELECT synonyms FROM synonyms WHERE word = ?", (word,)
+        ).fetchone()
+        if row is None:
+            return None
+        return row[0].split("\n") if row[0] else []
+
+    def _connect(self):
+        if not self.cache_file:
+            return None
+
+        # A connection can not be shared with a forked worker process, so every process opens its own
+        if self._connection is None or self._connection_pid != os.getpid():
+            create_dir_if_not_exists(os.path.dirname(self.cache_file) or ".")
+            self._connection = sqlite3.connect(self.cache_file, timeout=60)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS synonyms (word TEXT PRIMARY KEY, synonyms TEXT NOT NULL)"
+            )
+            self._connection_pid = os.getpid()
+
+        return self._connection
+
+
+# Synonym cache shared by the paraphrasing in this process
+synonym_cache = SynonymCache()
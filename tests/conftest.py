@@ -0,0 +1,44 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+# The tests import the modules as src.*, like app.py does when it is run from the root of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# Create a seeded corpus of {nr_docs} documents of {length} words, where every third document is a near-duplicate
+# (a few words replaced) of the document before it
+# @return the documents as a list of strings
+def make_corpus(nr_docs=60, length=40, vocabulary_size=200, seed=0):
+    rng = np.random.default_rng(seed)
+    documents = []
+    for idx in range(nr_docs):
+        if idx % 3 == 2:
+            words = documents[-1].split()
+            for position in rng.choice(length, 3, replace=False):
+                words[position] = f"w{rng.integers(vocabulary_size)}"
+        else:
+            words = [f"w{word}" for word in rng.integers(vocabulary_size, size=length)]
+        documents.append(" ".join(words))
+    return documents
+
+
+@pytest.fixture
+def documents():
+    return make_corpus()
+
+
+# File paths of the documents of make_corpus, named like the files of the Wikipedia dataset (<number>-<type>.txt)
+@pytest.fixture
+def file_paths(documents):
+    return [f"assets/preprocessed/{idx}-orig.txt" for idx in range(len(documents))]
+
+
+# The near-duplicates of make_corpus as fraud pairs
+@pytest.fixture
+def fraud_pairs(documents):
+    return np.array(
+        [(idx - 1, idx) for idx in range(len(documents)) if idx % 3 == 2],
+        dtype=np.int64,
+    )
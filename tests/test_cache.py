@@ -0,0 +1,100 @@
+import numpy as np
+from scipy.sparse import csc_matrix
+from src.LSH.cache import SignatureCache, corpus_fingerprint
+from src.LSH import LSHModel as LSHModel_module
+from src.LSH.LSHModel import LSHModel
+
+
+def test_signature_cache_is_bounded_by_bytes():
+    cache = SignatureCache(max_bytes=1000, cache_dir=None)
+    cache.put("a", np.zeros(100, dtype=np.uint32))
+    cache.put("b", np.zeros(100, dtype=np.uint32))
+    # Using "a" makes "b" the least recently used entry
+    cache.get("a")
+    cache.put("c", np.zeros(100, dtype=np.uint32))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.nbytes == 800
+
+    # An entry larger than the cache is not kept in memory
+    cache.put("d", np.zeros(1000, dtype=np.uint32))
+    assert cache.get("d") is None and cache.nbytes == 800
+
+
+def test_signature_cache_counts_sparse_matrices():
+    cache = SignatureCache(max_bytes=1 << 20, cache_dir=None)
+    shingles = csc_matrix(np.eye(10, dtype=np.uint8))
+
+    cache.put("shingles", shingles)
+
+    assert cache.nbytes == (
+        shingles.data.nbytes + shingles.indices.nbytes + shingles.indptr.nbytes
+    )
+
+
+def test_signature_cache_disk_tier(tmp_path):
+    signatures = np.arange(12, dtype=np.uint32).reshape(3, 4)
+    SignatureCache(cache_dir=str(tmp_path)).put(("signatures", 1), signatures)
+
+    # A new cache (e.g. in another process) reads the entry from disk
+    cache = SignatureCache(cache_dir=str(tmp_path))
+    np.testing.assert_array_equal(cache.get(("signatures", 1)), signatures)
+    assert cache.get(("signatures", 2)) is None
+
+
+def test_get_or_compute_computes_once():
+    cache = SignatureCache(cache_dir=None)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return np.ones(3)
+
+    cache.get_or_compute("key", compute)
+    cache.get_or_compute("key", compute)
+
+    assert len(calls) == 1
+
+
+def test_corpus_fingerprint():
+    assert corpus_fingerprint(["ab", "c"]) != corpus_fingerprint(["a", "bc"])
+    assert corpus_fingerprint(["ab", "c"]) == corpus_fingerprint(["ab", "c"])
+
+
+def test_models_with_other_banding_parameters_reuse_signatures(documents, monkeypatch):
+    cache = SignatureCache(cache_dir=None)
+    monkeypatch.setattr(LSHModel_module, "signature_cache", cache)
+    computed = []
+    compute_signature_matrix = LSHModel_module.compute_signature_matrix
+
+    def counting_compute_signature_matrix(*args, **kwargs):
+        computed.append(1)
+        return compute_signature_matrix(*args, **kwargs)
+
+    monkeypatch.setattr(
+        LSHModel_module, "compute_signature_matrix", counting_compute_signature_matrix
+    )
+
+    for n_bands, K in ((10, 1000), (5, 1000), (10, 500)):
+        LSHModel(
+            shingle_size=2, window_step=1, n_bands=n_bands, K=K, n_hash=50
+        ).candidates(documents)
+    assert len(computed) == 1
+
+    # Another window step gives other shingles, so the signatures are computed again
+    LSHModel(shingle_size=2, window_step=2, n_bands=10, K=1000, n_hash=50).candidates(
+        documents
+    )
+    assert len(computed) == 2
+
+
+def test_window_step_changes_the_shingles(documents):
+    shingles = [
+        LSHModel(shingle_size=2, window_step=window_step, n_bands=10, K=1000, n_hash=50)
+        .shingle(documents)
+        .nnz
+        for window_step in (1, 2)
+    ]
+
+    assert shingles[1] < shingles[0]
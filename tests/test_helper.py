@@ -0,0 +1,110 @@
+import numpy as np
+from src.helpers.helper import (
+    document_metadata,
+    map_to_original_pairs,
+    filter_pairs_by_number,
+    optimize_fraud_pair_indexing,
+)
+
+FILE_PATHS = [
+    "assets/preprocessed/1-orig.txt",
+    "assets/paraphrased/1-orig/1-orig_paraphrased_0.txt",
+    "assets/paraphrased/1-orig/1-orig_paraphrased_1.txt",
+    "assets/preprocessed/2-orig.txt",
+    "assets/preprocessed/2-heavy.txt",
+]
+
+
+def test_document_metadata():
+    metadata = document_metadata(FILE_PATHS)
+
+    assert metadata["number"].tolist() == [1, 1, 1, 2, 2]
+    assert metadata["paraphrased"].tolist() == [False, True, True, False, False]
+    assert metadata["original_idx"].tolist() == [0, 0, 0, 3, 4]
+    # Documents with the same type have the same type code
+    types = metadata["type"].tolist()
+    assert types[0] == types[1] == types[2] == types[3] != types[4]
+
+
+def test_document_metadata_of_no_documents():
+    assert len(document_metadata([])) == 0
+
+
+def test_map_to_original_pairs():
+    candidate_pairs = np.array([[0, 1], [1, 2], [1, 3], [3, 2], [3, 4]])
+
+    keep, original_pairs = map_to_original_pairs(
+        candidate_pairs, document_metadata(FILE_PATHS)
+    )
+
+    # A file is never compared with (a paraphrased version of) itself
+    assert keep.tolist() == [False, False, True, True, True]
+    # Paraphrased files are mapped to their original file, with the smallest index first
+    assert original_pairs.tolist() == [[0, 3], [0, 3], [3, 4]]
+
+
+def test_filter_pairs_by_number():
+    candidate_pairs = [(0, 1), (1, 3), (2, 3), (0, 3), (3, 4)]
+
+    pairs = filter_pairs_by_number(candidate_pairs, FILE_PATHS)
+
+    assert pairs.dtype == np.int64
+    assert pairs.tolist() == [[0, 3], [3, 4]]
+    assert (
+        filter_pairs_by_number(
+            candidate_pairs, None, document_metadata(FILE_PATHS)
+        ).tolist()
+        == pairs.tolist()
+    )
+
+
+def test_filter_pairs_by_number_without_candidates():
+    assert filter_pairs_by_number([], FILE_PATHS).shape == (0, 2)
+
+
+def test_optimize_fraud_pair_indexing():
+    file_paths = [
+        "assets/preprocessed/1-ORIG.txt",
+        "assets/paraphrased/1-ORIG/1-ORIG_paraphrased_0.txt",
+        "assets/preprocessed/1-SPUN.txt",
+        "assets/preprocessed/2-ORIG.txt",
+    ]
+    fraud_pairs = [
+        ("1-ORIG.txt", "1-SPUN.txt"),
+        # Duplicates and unknown files are ignored
+        ("1-ORIG.txt", "1-SPUN.txt"),
+        ("2-ORIG.txt", "3-SPUN.txt"),
+    ]
+
+    pairs = optimize_fraud_pair_indexing(fraud_pairs, file_paths)
+
+    # The paraphrased versions of the first file are linked as well
+    assert pairs.dtype == np.int64
+    assert pairs.tolist() == [[0, 2], [1, 2]]
+
+
+def test_optimize_fraud_pair_indexing_only_links_original_second_files():
+    file_paths = [
+        "assets/preprocessed/1-ORIG.txt",
+        "assets/paraphrased/1-ORIG/1-ORIG_paraphrased_0.txt",
+        "assets/preprocessed/1-SPUN.txt",
+    ]
+
+    pairs = optimize_fraud_pair_indexing([("1-SPUN.txt", "1-ORIG.txt")], file_paths)
+
+    assert pairs.tolist() == [[0, 2]]
+
+
+def test_optimize_fraud_pair_indexing_with_code_files():
+    # Code files keep the extension of their source file, so Foo.py and Foo.java are different files
+    file_paths = [
+        "assets/preprocessed/Foo.py.txt",
+        "assets/paraphrased/Foo.py/Foo.py_paraphrased_0.txt",
+        "assets/paraphrased/Foo.py/Foo.py_paraphrased_1.txt",
+        "assets/preprocessed/Foo.java.txt",
+        "assets/preprocessed/Bar.py.txt",
+    ]
+
+    pairs = optimize_fraud_pair_indexing([("Foo.py", "Bar.py")], file_paths)
+
+    assert pairs.tolist() == [[0, 4], [1, 4], [2, 4]]
@@ -0,0 +1,107 @@
+import itertools
+import numpy as np
+import pytest
+from src.LSH.hashing import Hashing
+from src.LSH.lsh import lsh, bucket_pairs
+
+
+# Reference banding: two documents are candidates if their keys are equal in at least one band
+def brute_force_candidates(sig, hashing):
+    r = sig.shape[0] // hashing.n_bands
+    candidates = set()
+    for i in range(hashing.n_bands):
+        keys = hashing.band_keys(sig[i * r : (i + 1) * r], i).tolist()
+        for a, b in itertools.combinations(range(sig.shape[1]), 2):
+            if keys[a] == keys[b]:
+                candidates.add((a, b))
+    return candidates
+
+
+def as_list(pairs):
+    return [tuple(pair) for pair in pairs.tolist()]
+
+
+@pytest.fixture
+def signatures():
+    # Few distinct values, so documents share bands by chance
+    rng = np.random.default_rng(0)
+    return rng.integers(0, 3, size=(24, 60), dtype=np.uint32)
+
+
+def test_lsh_equals_brute_force_banding(signatures):
+    # A small K makes the keys of different bands collide, which the grouping has to reproduce as well
+    hashing = Hashing(n_hash=24, n_bands=8, K=50, band_key_mode="dot")
+
+    pairs = lsh(signatures, hashing)
+
+    assert pairs.dtype == np.int64 and pairs.shape[1] == 2
+    assert len(pairs) > 0
+    assert set(as_list(pairs)) == brute_force_candidates(signatures, hashing)
+    # The pairs are sorted and unique
+    assert as_list(pairs) == sorted(set(as_list(pairs)))
+
+
+def test_bucket_pairs_emits_all_pairs_within_buckets():
+    keys = np.array([5, 1, 5, 2, 5, 1])
+
+    pairs = bucket_pairs(keys, max_bucket_size=10)
+
+    assert sorted(as_list(pairs)) == [(0, 2), (0, 4), (1, 5), (2, 4)]
+
+
+def test_bucket_pairs_samples_oversized_buckets():
+    keys = np.array([7] * 10 + [3, 3])
+
+    pairs = bucket_pairs(keys, max_bucket_size=4, rng=np.random.default_rng(0))
+
+    # One sampled bucket of 4 documents (6 pairs) and the pair of the small bucket
+    assert len(pairs) == 7
+    assert (10, 11) in as_list(pairs)
+    assert np.all(pairs[:, 0] < pairs[:, 1])
+
+
+def test_lsh_with_exact_keys_equals_brute_force_banding(signatures):
+    hashing = Hashing(n_hash=24, n_bands=8, band_key_mode="exact")
+
+    pairs = lsh(signatures, hashing)
+
+    assert set(as_list(pairs)) == brute_force_candidates(signatures, hashing)
+
+
+def test_exact_band_keys_only_match_identical_bands():
+    hashing = Hashing(n_hash=6, n_bands=2, band_key_mode="exact")
+    band = np.array([[1, 1, 2, 1], [5, 5, 5, 6], [9, 9, 9, 9]], dtype=np.uint32)
+
+    keys = hashing.band_keys(band, 0)
+
+    assert keys[0] == keys[1]
+    assert keys[0] != keys[2] and keys[0] != keys[3] and keys[2] != keys[3]
+
+
+def test_exact_keys_never_give_more_candidates_than_dot_keys(signatures):
+    # Identical bands have identical dot keys, the dot keys can also collide for different bands
+    exact = lsh(signatures, Hashing(n_hash=24, n_bands=8, band_key_mode="exact"))
+    dot = lsh(signatures, Hashing(n_hash=24, n_bands=8, K=50, band_key_mode="dot"))
+
+    assert set(as_list(exact)) < set(as_list(dot))
+
+
+def test_unknown_band_key_mode_is_rejected(signatures):
+    with pytest.raises(ValueError):
+        Hashing(n_hash=24, n_bands=8, band_key_mode="unknown").band_keys(
+            signatures[:3], 0
+        )
+
+
+@pytest.mark.parametrize("band_key_mode", ["dot", "exact"])
+def test_parallel_bands_equal_serial_bands(signatures, band_key_mode):
+    # A small K makes the "dot" keys collide, which every worker has to reproduce as well
+    hashing = Hashing(n_hash=24, n_bands=8, K=50, band_key_mode=band_key_mode)
+
+    serial = lsh(signatures, hashing, n_jobs=1)
+    parallel = lsh(signatures, hashing, n_jobs=3)
+
+    np.testing.assert_array_equal(parallel, serial)
+    assert set(map(tuple, parallel.tolist())) == brute_force_candidates(
+        signatures, hashing
+    )
@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+from src.LSH.LSHIndex import LSHIndex
+from src.LSH.lsh import lsh
+from src.LSH.signature_store import SignatureStore
+
+
+def make_index():
+    return LSHIndex(shingle_size=2, n_hash=50, n_bands=10, K=1000, word_based=True)
+
+
+def test_add_assigns_indices_and_identifiers(documents):
+    index = make_index()
+
+    assert index.add(documents[:4], [f"doc{idx}" for idx in range(4)]) == [0, 1, 2, 3]
+    assert index.add(documents[4:6]) == [4, 5]
+    assert len(index) == 6
+    assert index.document_ids == ["doc0", "doc1", "doc2", "doc3", 4, 5]
+    assert index.signatures.shape == (50, 6)
+
+
+def test_add_requires_one_identifier_per_document(documents):
+    with pytest.raises(AssertionError):
+        make_index().add(documents[:2], ["doc0"])
+
+
+def test_query_finds_the_near_duplicate(documents):
+    index = make_index()
+    # Document 2 is a near-duplicate of document 1, it is not added itself
+    index.add(documents[:2] + documents[3:], [idx for idx in range(60) if idx != 2])
+
+    candidates = index.query(documents[2])
+
+    assert 1 in candidates and 2 not in candidates
+
+
+def test_buckets_agree_with_lsh(documents):
+    index = make_index()
+    index.add(documents[:30])
+    index.add(documents[30:])
+
+    pairs = set()
+    for bucket_table in index.buckets:
+        for members in bucket_table.values():
+            pairs.update(
+                (a, b)
+                for position, a in enumerate(members)
+                for b in members[position + 1 :]
+            )
+
+    expected = lsh(np.asarray(index.signatures), index.hashing)
+    assert pairs == set(map(tuple, expected.tolist()))
+
+
+def test_save_add_load_add_keeps_signatures_aligned(documents, tmp_path):
+    path = str(tmp_path / "index")
+    index = make_index()
+    index.add(documents[:20])
+    index.save(path)
+
+    # Documents added after the last save are not part of the saved index
+    index.add(documents[20:40])
+    assert SignatureStore.open(path).num_documents == 20
+
+    loaded = LSHIndex.load(path)
+    assert len(loaded) == 20 and loaded.signatures.shape == (50, 20)
+
+    loaded.add(documents[40:45])
+    loaded.save(path)
+    loaded = LSHIndex.load(path)
+
+    # Document index i still belongs to signature column i
+    assert len(loaded) == 25
+    np.testing.assert_array_equal(
+        loaded.signatures,
+        loaded.compute_signatures(documents[:20] + documents[40:45]),
+    )
+    assert 20 in loaded.query(documents[40])
+
+
+def test_load_truncates_signatures_stored_after_the_index(documents, tmp_path):
+    path = str(tmp_path / "index")
+    index = make_index()
+    index.add(documents[:10])
+    index.save(path)
+    # As if the process stopped after writing the store but before writing the index file
+    SignatureStore.open(path).append(index.compute_signatures(documents[10:15]))
+
+    loaded = LSHIndex.load(path)
+
+    assert loaded.store.num_documents == 10
+    loaded.add(documents[10:12])
+    np.testing.assert_array_equal(
+        loaded.signatures, loaded.compute_signatures(documents[:12])
+    )
+
+
+def test_load_rejects_a_store_with_missing_signatures(documents, tmp_path):
+    path = str(tmp_path / "index")
+    index = make_index()
+    index.add(documents[:10])
+    index.save(path)
+    SignatureStore.open(path).truncate(8)
+
+    with pytest.raises(ValueError):
+        LSHIndex.load(path)
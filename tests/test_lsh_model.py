@@ -0,0 +1,109 @@
+import os
+import numpy as np
+import pytest
+from src.constants import HASHED_SHINGLES
+from src.LSH.LSHModel import LSHModel
+from src.LSH.cache import signature_cache
+
+
+@pytest.fixture
+def written_file_paths(documents, tmp_path, monkeypatch):
+    # The file paths are parsed relative to the root of the repository (assets/preprocessed/<file>)
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("assets/preprocessed")
+    file_paths = []
+    for idx, document in enumerate(documents):
+        file_path = f"assets/preprocessed/doc{idx}x.txt"
+        with open(file_path, "w", encoding="utf-8") as file:
+            file.write(document)
+        file_paths.append(file_path)
+    return file_paths
+
+
+@pytest.fixture(autouse=True)
+def hashed_shingles():
+    # Streaming always uses hashed shingles, so predict has to use them too to give the same result
+    hashed_shingles = HASHED_SHINGLES[0]
+    HASHED_SHINGLES[0] = True
+    signature_cache.clear()
+    yield
+    HASHED_SHINGLES[0] = hashed_shingles
+    signature_cache.clear()
+
+
+def as_set(pairs):
+    return set(map(tuple, np.asarray(pairs).tolist()))
+
+
+@pytest.mark.parametrize("verification_threshold", [None, 0.5])
+def test_predict_stream_equals_predict(
+    documents, written_file_paths, verification_threshold
+):
+    model = LSHModel(
+        shingle_size=2,
+        window_step=1,
+        n_bands=10,
+        K=1000,
+        n_hash=50,
+        verification_threshold=verification_threshold,
+        verification_method="estimated",
+    )
+
+    expected = model.predict(documents, written_file_paths, optimization=True)
+    streamed = model.predict_stream(
+        written_file_paths, chunk_size=7, store_path="store", optimization=True
+    )
+
+    assert as_set(streamed) == as_set(expected)
+    # The near-duplicates are found
+    assert {(1, 2), (4, 5), (7, 8)} <= as_set(streamed)
+
+
+def test_predict_stream_rejects_exact_verification(written_file_paths):
+    model = LSHModel(
+        shingle_size=2,
+        window_step=1,
+        n_bands=10,
+        K=1000,
+        n_hash=50,
+        verification_threshold=0.5,
+        verification_method="exact",
+    )
+
+    with pytest.raises(ValueError):
+        model.predict_stream(written_file_paths, store_path="store")
+
+
+def test_predict_does_not_depend_on_n_jobs(documents, file_paths):
+    model = LSHModel(shingle_size=2, window_step=2, n_bands=10, K=1000, n_hash=50)
+
+    expected = model.predict(documents, file_paths, optimization=True)
+    signature_cache.clear()
+    parallel = model.predict(documents, file_paths, optimization=True, n_jobs=2)
+
+    assert as_set(parallel) == as_set(expected)
+
+
+@pytest.mark.parametrize("as_array", [True, False])
+def test_score_equals_set_based_counts(documents, file_paths, fraud_pairs, as_array):
+    model = LSHModel(shingle_size=2, window_step=1, n_bands=25, K=1000, n_hash=50)
+    # Add a pair that is not found, and a duplicate ground truth pair
+    ground_truth = as_set(fraud_pairs) | {(0, len(documents) - 1)}
+    y = (
+        np.concatenate((np.asarray(sorted(ground_truth)), fraud_pairs[:1]))
+        if as_array
+        else ground_truth
+    )
+
+    f1, precision, recall, fp, fn, tp, tn = model.score(documents, y, file_paths)
+
+    predicted = as_set(model.predict(documents, file_paths, optimization=True))
+    assert tp == len(predicted & ground_truth) > 0
+    assert fp == len(predicted - ground_truth)
+    assert fn == len(ground_truth - predicted) > 0
+    assert tn == len(documents) * (len(documents) - 1) // 2 - len(
+        predicted | ground_truth
+    )
+    assert precision == pytest.approx(tp / (tp + fp))
+    assert recall == pytest.approx(tp / (tp + fn))
+    assert f1 == pytest.approx(2 * precision * recall / (precision + recall))
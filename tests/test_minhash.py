@@ -0,0 +1,133 @@
+import numpy as np
+import pytest
+from scipy.sparse import csr_matrix
+from src.LSH.hashing import Hashing
+from src.LSH.shingle import word_based_shingle, shingle_documents
+from src.LSH.minhash import (
+    compute_signature_matrix,
+    compute_signature_matrix_parallel,
+    compute_document_signatures_parallel,
+)
+from src.LSH.lsh import lsh
+from src.LSH.cache import SignatureCache
+from src.LSH import LSHModel as LSHModel_module
+from src.LSH.LSHModel import LSHModel
+from src.constants import NESTED_HASHING
+
+
+# Reference MinHash: hash every shingle of every document on its own and keep the minimum per hash function
+def plain_signature_matrix(shingles, hashing):
+    shingles = shingles.tocsc()
+    sig = np.full(
+        (hashing.n_hash, shingles.shape[1]), hashing._max_hash, dtype=np.uint32
+    )
+    for doc in range(shingles.shape[1]):
+        for shingle in shingles.indices[
+            shingles.indptr[doc] : shingles.indptr[doc + 1]
+        ]:
+            sig[:, doc] = np.minimum(sig[:, doc], hashing.hash_idxs(shingle))
+    return sig
+
+
+@pytest.fixture
+def shingles(documents):
+    return word_based_shingle(documents, shingle_size=2)
+
+
+@pytest.mark.parametrize("block_size", [1, 7, 100, 1 << 15])
+def test_blocked_signatures_equal_plain_loop(shingles, block_size):
+    hashing = Hashing(n_hash=20, n_bands=5)
+
+    np.testing.assert_array_equal(
+        compute_signature_matrix(shingles, hashing, block_size=block_size),
+        plain_signature_matrix(shingles, hashing),
+    )
+
+
+def test_csr_and_csc_give_the_same_signatures(shingles):
+    hashing = Hashing(n_hash=20, n_bands=5)
+
+    np.testing.assert_array_equal(
+        compute_signature_matrix(csr_matrix(shingles), hashing),
+        compute_signature_matrix(shingles.tocsc(), hashing),
+    )
+
+
+def test_empty_documents_keep_the_max_hash():
+    hashing = Hashing(n_hash=8, n_bands=2)
+    shingles = csr_matrix(np.array([[1, 0, 0], [0, 0, 1], [1, 0, 1]], dtype=np.uint8))
+
+    sig = compute_signature_matrix(shingles, hashing, block_size=1)
+
+    assert np.all(sig[:, 1] == hashing._max_hash)
+    np.testing.assert_array_equal(sig, plain_signature_matrix(shingles, hashing))
+
+
+def test_nested_hashing_prefix_equals_smaller_signature(shingles):
+    large = Hashing(n_hash=40, n_bands=8, nested=True)
+    small = Hashing(n_hash=15, n_bands=3, nested=True)
+
+    np.testing.assert_array_equal(
+        compute_signature_matrix(shingles, large)[:15],
+        compute_signature_matrix(shingles, small),
+    )
+
+
+def test_nested_models_share_one_signature_matrix(documents, monkeypatch):
+    monkeypatch.setattr(
+        LSHModel_module, "signature_cache", SignatureCache(cache_dir=None)
+    )
+    nested_hashing = NESTED_HASHING[0]
+    NESTED_HASHING[0] = True
+    try:
+        candidates = {
+            n_hash: LSHModel(
+                shingle_size=2, window_step=1, n_bands=5, K=1000, n_hash=n_hash
+            ).candidates(documents)
+            for n_hash in (20, 40)
+        }
+    finally:
+        NESTED_HASHING[0] = nested_hashing
+
+    assert len(LSHModel_module.signature_cache._entries) == 2  # shingles and signatures
+    for n_hash, records in candidates.items():
+        hashing = Hashing(n_hash=n_hash, n_bands=5, K=1000, nested=True)
+        expected = lsh(
+            compute_signature_matrix(word_based_shingle(documents, 2), hashing), hashing
+        )
+        assert list(zip(records["doc_a"], records["doc_b"])) == list(
+            map(tuple, expected.tolist())
+        )
+
+
+@pytest.mark.parametrize("n_jobs", [2, 3])
+def test_parallel_signatures_equal_plain_loop(shingles, n_jobs):
+    hashing = Hashing(n_hash=20, n_bands=5)
+
+    sig = compute_signature_matrix_parallel(shingles, hashing, n_jobs=n_jobs)
+
+    np.testing.assert_array_equal(sig, plain_signature_matrix(shingles, hashing))
+
+
+@pytest.mark.parametrize("word_based", [True, False])
+def test_parallel_document_signatures_equal_serial(documents, word_based):
+    hashing = Hashing(n_hash=20, n_bands=5)
+    shingles = shingle_documents(
+        documents,
+        shingle_size=3,
+        window_step=2,
+        word_based=word_based,
+        hashed_shingles=True,
+    )
+
+    sig = compute_document_signatures_parallel(
+        documents,
+        hashing,
+        shingle_size=3,
+        n_jobs=2,
+        window_step=2,
+        word_based=word_based,
+        hashed_shingles=True,
+    )
+
+    np.testing.assert_array_equal(sig, compute_signature_matrix(shingles, hashing))
@@ -0,0 +1,113 @@
+import numpy as np
+from src.optimizing import optimize as optimize_module
+from src.optimizing.optimize import successive_halving, prescreen_configurations
+from src.LSH.similarity import candidate_probability, candidate_threshold
+from src.helpers.helper import subsample_documents
+from src.constants import HALVING_ETA
+
+
+# File paths of {nr_files} files, each followed by {nr_versions} paraphrased versions
+def paraphrased_file_paths(nr_files, nr_versions):
+    file_paths = []
+    for idx in range(nr_files):
+        file_paths.append(f"assets/preprocessed/{idx}-orig.txt")
+        file_paths += [
+            f"assets/paraphrased/{idx}-orig/{idx}-orig_paraphrased_{version}.txt"
+            for version in range(nr_versions)
+        ]
+    return file_paths
+
+
+def test_subsample_documents_keeps_groups_together():
+    file_paths = paraphrased_file_paths(20, 2)
+    documents = [f"document {idx}" for idx in range(len(file_paths))]
+    # Files 0 and 5 (document indices 0 and 15) form a fraud pair
+    fraud_pairs = np.array([[0, 15], [3, 6]])
+
+    sample_documents, sample_file_paths, sample_fraud_pairs = subsample_documents(
+        documents, file_paths, fraud_pairs, 0.3, np.random.default_rng(0)
+    )
+
+    assert len(sample_documents) >= 0.3 * len(documents)
+    assert sample_documents == [
+        documents[file_paths.index(file_path)] for file_path in sample_file_paths
+    ]
+    # The order is preserved and every original is sampled together with its paraphrased versions
+    indices = [file_paths.index(file_path) for file_path in sample_file_paths]
+    assert indices == sorted(indices)
+    for idx in indices:
+        original_idx = idx - idx % 3
+        assert {original_idx, original_idx + 1, original_idx + 2} <= set(indices)
+    # Fraud pairs are sampled together and re-indexed to the sample
+    assert (0 in indices) == (15 in indices)
+    expected = [
+        [indices.index(first), indices.index(second)]
+        for first, second in fraud_pairs.tolist()
+        if first in indices and second in indices
+    ]
+    assert sample_fraud_pairs.tolist() == expected
+
+
+def test_successive_halving_keeps_the_best_configurations(monkeypatch):
+    rounds = []
+
+    # Score a configuration by its n_hash, without running it
+    def evaluate_configurations(docs, param_list, fraud_pairs, file_paths):
+        rounds.append((len(docs), [params["n_hash"] for params in param_list]))
+        return [(params["n_hash"] / 100, params) + (0,) * 6 for params in param_list]
+
+    monkeypatch.setattr(
+        optimize_module, "evaluate_configurations", evaluate_configurations
+    )
+    file_paths = paraphrased_file_paths(100, 0)
+    documents = [f"document {idx}" for idx in range(100)]
+    param_list = [{"n_hash": n_hash} for n_hash in range(10, 100, 10)]
+
+    results = successive_halving(
+        documents,
+        param_list,
+        np.empty((0, 2), dtype=np.int64),
+        file_paths,
+        np.random.default_rng(0),
+    )
+
+    # Every round keeps the best 1/HALVING_ETA of the configurations on a larger sample
+    assert [len(configurations) for _, configurations in rounds] == [
+        9,
+        9 // HALVING_ETA,
+        1,
+    ]
+    assert rounds[0][0] < rounds[1][0] < rounds[-1][0] == 100
+    assert rounds[1][1] == [90, 80, 70]
+    assert [params for _, params, *_ in results] == [{"n_hash": 90}]
+
+
+def test_prescreen_drops_configurations_that_miss_the_near_duplicates(
+    documents, file_paths, fraud_pairs
+):
+    # The near-duplicates have a Jaccard similarity of about 0.7 for bigrams
+    good = {"shingle_size": 2, "window_step": 1, "n_hash": 100, "n_bands": 20}
+    # 100 rows in a single band: the near-duplicates are almost never candidates
+    bad = {"shingle_size": 2, "window_step": 1, "n_hash": 100, "n_bands": 1}
+    # 50 rows in two bands: most near-duplicates are still missed
+    weak = {"shingle_size": 2, "window_step": 1, "n_hash": 100, "n_bands": 2}
+
+    kept = prescreen_configurations(
+        documents, [bad, good, weak], fraud_pairs, file_paths, np.random.default_rng(0)
+    )
+
+    assert kept == [good]
+
+
+def test_candidate_probability_follows_the_s_curve():
+    similarities = np.linspace(0, 1, 11)
+
+    probabilities = candidate_probability(similarities, rows=5, n_bands=20)
+
+    assert probabilities[0] == 0 and probabilities[-1] == 1
+    assert np.all(np.diff(probabilities) > 0)
+    # The curve is steepest around the threshold
+    threshold = candidate_threshold(rows=5, n_bands=20)
+    assert 0.4 < threshold < 0.6
+    assert candidate_probability(threshold + 0.1, 5, 20) > 0.8
+    assert candidate_probability(threshold - 0.2, 5, 20) < 0.2
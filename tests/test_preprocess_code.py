@@ -0,0 +1,93 @@
+import pytest
+
+# The Java tokenizer and the text preprocessing in the same module depend on these packages
+pytest.importorskip("tokenize_all")
+pytest.importorskip("contractions")
+
+from src.preprocessing.ProcessClass import CodePreprocessor
+from src.preprocessing.preprocess_code import tokens_to_document
+
+PYTHON_CODE = """import os
+class Foo(Base):
+    def bar(self, x=1):
+        # A comment
+        s = f"{x} and {self.y!r}" + 'q'
+        if x is None:
+            return [i * 2 for i in range(10)]
+        return True
+"""
+
+
+def python_document(code):
+    tokens = CodePreprocessor(code, "python").process()
+    return tokens_to_document([(token.type, token.value) for token in tokens])
+
+
+def test_python_tokens_have_the_java_token_types():
+    tokens = [
+        (token.type, token.value)
+        for token in CodePreprocessor(PYTHON_CODE, "python").process()
+    ]
+
+    assert ("keyword", "import") in tokens
+    assert ("class name", "Foo") in tokens
+    assert ("function", "bar") in tokens
+    assert ("identifier", "x") in tokens
+    assert ("number", "10") in tokens
+    assert ("keyword literal", "None") in tokens
+    assert ("string", "'q'") in tokens
+    # The structure of the code is kept with the Java token types
+    assert ("semicolon", ";") in tokens
+    assert ("left brace", "{") in tokens and ("right brace", "}") in tokens
+    # Comments are removed and an f-string is a single token
+    assert not any("comment" in value.lower() for _, value in tokens)
+    assert len([value for _, value in tokens if value.startswith("f")]) == 1
+
+
+def test_renaming_does_not_change_the_python_document():
+    renamed = (
+        PYTHON_CODE.replace("Foo", "Qux")
+        .replace("bar", "baz")
+        .replace("x", "zz")
+        .replace("10", "3")
+    )
+
+    assert python_document(renamed) == python_document(PYTHON_CODE)
+    assert python_document(PYTHON_CODE.replace("if", "while")) != python_document(
+        PYTHON_CODE
+    )
+
+
+def test_python_tokens_up_to_a_syntax_error_are_kept():
+    tokens = CodePreprocessor("def f(:\n  x = (1,\n", "python").process()
+
+    assert [token.value for token in tokens][:3] == ["def", "f", "("]
+
+
+def test_java_tokenization():
+    tokens = CodePreprocessor(
+        "class Foo {\n    // A comment\n    int bar() { return 1; }\n}\n", "java"
+    ).process()
+
+    values = [token.value for token in tokens]
+    assert "Foo" in values and "bar" in values
+    assert not any("comment" in value.lower() for value in values)
+
+
+def test_unknown_language_is_rejected():
+    with pytest.raises(ValueError):
+        CodePreprocessor("", "cobol").process()
+
+
+def test_tokens_to_document():
+    tokens = [
+        ("keyword", "def"),
+        ("function", "bar"),
+        ("operator", "("),
+        ("string", "'a b'"),
+        ("operator", ")"),
+    ]
+
+    assert tokens_to_document(tokens) == "def function ( string )"
+    # Without normalized token types, whitespace within a token is replaced so it stays a single token
+    assert tokens_to_document(tokens, []) == "def bar ( 'a_b' )"
@@ -0,0 +1,59 @@
+from src.preprocessing.preprocessing_cache import PreprocessingCache
+
+
+def test_preprocessing_cache_keys():
+    key = PreprocessingCache.key("some text", ("text", 0.5, 1))
+
+    assert key == PreprocessingCache.key("some text", ("text", 0.5, 1))
+    assert key != PreprocessingCache.key("some text", ("text", 0.6, 1))
+    assert key != PreprocessingCache.key("other text", ("text", 0.5, 1))
+
+
+def test_preprocessing_cache_flush_and_reload(tmp_path):
+    cache = PreprocessingCache(cache_dir=str(tmp_path))
+    key = PreprocessingCache.key("some text", ("text", 0.5, 1))
+    cache.put(key, ["some", "text"])
+
+    # Entries are only written on flush
+    assert PreprocessingCache(cache_dir=str(tmp_path)).get(key) is None
+    cache.flush()
+    assert PreprocessingCache(cache_dir=str(tmp_path)).get(key) == ["some", "text"]
+
+
+def test_preprocessing_cache_merges_worker_entries(tmp_path):
+    worker_cache = PreprocessingCache(cache_dir=str(tmp_path))
+    worker_cache.put("ab01", [1])
+    worker_cache.put("cd02", [2])
+
+    # The main process takes over the entries of a worker and writes them
+    cache = PreprocessingCache(cache_dir=str(tmp_path))
+    cache.update(worker_cache.pop_pending())
+    cache.flush()
+
+    assert worker_cache.pop_pending() == {}
+    reloaded = PreprocessingCache(cache_dir=str(tmp_path))
+    assert reloaded.get("ab01") == [1] and reloaded.get("cd02") == [2]
+
+
+def test_preprocessing_cache_keeps_entries_of_other_runs(tmp_path):
+    first = PreprocessingCache(cache_dir=str(tmp_path))
+    second = PreprocessingCache(cache_dir=str(tmp_path))
+    # Both keys are in the same shard
+    first.put("ab01", [1])
+    second.put("ab02", [2])
+
+    first.flush()
+    second.flush()
+
+    reloaded = PreprocessingCache(cache_dir=str(tmp_path))
+    assert reloaded.get("ab01") == [1] and reloaded.get("ab02") == [2]
+
+
+def test_preprocessing_cache_ignores_unreadable_shards(tmp_path):
+    (tmp_path / "ab.pkl").write_bytes(b"not a pickle")
+    cache = PreprocessingCache(cache_dir=str(tmp_path))
+
+    assert cache.get("ab01") is None
+    cache.put("ab01", [1])
+    cache.flush()
+    assert PreprocessingCache(cache_dir=str(tmp_path)).get("ab01") == [1]
@@ -0,0 +1,134 @@
+import csv
+import json
+import pstats
+import pytest
+from src.constants import PROFILE_STAGES
+from src.helpers.profiling import Profiler, profiler
+from src.optimizing.optimize import evaluate_configurations
+
+
+def test_stage_measurements_are_added_up():
+    profiler = Profiler(hot_paths=False)
+
+    with profiler.stage("shingle", items=10):
+        pass
+    with profiler.stage("shingle") as measurement:
+        # The items can also be set within the stage
+        measurement["items"] = 5
+
+    stage = profiler.records()["shingle"]
+    assert stage["calls"] == 2
+    assert stage["items"] == 15
+    assert stage["wall_time"] >= 0 and stage["cpu_time"] >= 0
+
+
+def test_stage_is_recorded_when_it_raises():
+    profiler = Profiler(hot_paths=False)
+
+    with pytest.raises(RuntimeError):
+        with profiler.stage("band", items=3):
+            raise RuntimeError
+
+    assert profiler.records()["band"]["calls"] == 1
+
+
+def test_merge_adds_the_records_of_a_worker():
+    profiler = Profiler(hot_paths=False)
+    with profiler.stage("minhash", items=2):
+        pass
+
+    worker = Profiler(hot_paths=False)
+    with worker.stage("minhash", items=3):
+        pass
+    with worker.stage("score", items=4):
+        pass
+    records = worker.records()
+    profiler.merge(records)
+
+    stages = profiler.records()
+    assert stages["minhash"]["calls"] == 2 and stages["minhash"]["items"] == 5
+    assert stages["score"] == records["score"]
+
+    profiler.reset()
+    assert profiler.records() == {}
+
+
+def test_merge_combines_the_memory_measurements():
+    record = {
+        "calls": 1,
+        "wall_time": 1.0,
+        "cpu_time": 0.5,
+        "rss_mb": 100.0,
+        "rss_change_mb": 10.0,
+        "process_peak_rss_mb": 150.0,
+        "items": 1,
+    }
+    profiler = Profiler(hot_paths=False)
+
+    profiler.merge({"filter": record})
+    profiler.merge(
+        {
+            "filter": dict(
+                record, rss_mb=80.0, rss_change_mb=-5.0, process_peak_rss_mb=200.0
+            )
+        }
+    )
+
+    stage = profiler.records()["filter"]
+    assert stage["wall_time"] == 2.0 and stage["cpu_time"] == 1.0
+    assert stage["rss_mb"] == 100.0
+    assert stage["rss_change_mb"] == 5.0
+    assert stage["process_peak_rss_mb"] == 200.0
+
+
+def test_save_writes_the_report_and_appends_to_the_csv(tmp_path):
+    profiler = Profiler(hot_paths=True)
+    with profiler.stage("minhash", items=8):
+        sum(range(1000))
+    csv_file = tmp_path / "profile.csv"
+
+    profiler.save(str(tmp_path / "first"), str(csv_file), run_name="first")
+    report = profiler.save(str(tmp_path / "second"), str(csv_file), run_name="second")
+
+    with open(tmp_path / "second" / "profile.json", encoding="utf-8") as file:
+        assert json.load(file) == report
+    assert report["run"] == "second"
+    assert report["stages"]["minhash"]["items"] == 8
+    assert report["stages"]["minhash"]["items_per_second"] > 0
+
+    # One header and one row per run, with the measurements of every stage
+    with open(csv_file, newline="", encoding="utf-8-sig") as file:
+        rows = list(csv.reader(file))
+    assert [row[0] for row in rows[1:]] == ["first", "second"]
+    assert all(len(row) == 1 + 6 * len(PROFILE_STAGES) for row in rows)
+    minhash_column = 1 + 6 * PROFILE_STAGES.index("minhash")
+    assert rows[0][minhash_column] == "minhash wall time (s)"
+    assert rows[1][minhash_column + 5] == "8"
+
+    # The hot paths of every stage can be inspected with pstats
+    pstats.Stats(str(tmp_path / "second" / "profile_minhash.prof"))
+
+
+def test_evaluate_configurations_merges_the_records_of_the_workers(
+    documents, file_paths, fraud_pairs
+):
+    param_list = [
+        {
+            "shingle_size": 2,
+            "window_step": 1,
+            "n_hash": 50,
+            "n_bands": n_bands,
+            "K": 1000,
+        }
+        for n_bands in (10, 25)
+    ]
+    profiler.reset()
+
+    results = evaluate_configurations(documents, param_list, fraud_pairs, file_paths)
+
+    # Every configuration is scored in a worker process, whose measurements are sent back with its result
+    stages = profiler.records()
+    profiler.reset()
+    assert len(results) == 2
+    assert stages["score"]["calls"] == 2
+    assert stages["band"]["calls"] >= 2
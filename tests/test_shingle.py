@@ -0,0 +1,64 @@
+import numpy as np
+from src.LSH.shingle import (
+    word_based_shingle,
+    character_based_shingle,
+    word_based_hashed_shingle,
+    character_based_hashed_shingle,
+)
+from src.LSH.similarity import exact_jaccard
+
+
+# @return the sorted row indices (shingle ids) of every column (document) of a shingles matrix
+def shingle_ids(shingles):
+    shingles = shingles.tocsc()
+    return [
+        sorted(shingles.indices[shingles.indptr[doc] : shingles.indptr[doc + 1]])
+        for doc in range(shingles.shape[1])
+    ]
+
+
+def test_hashed_shingle_ids_do_not_depend_on_the_other_documents(documents):
+    together = shingle_ids(word_based_hashed_shingle(documents, shingle_size=3))
+    alone = [
+        shingle_ids(word_based_hashed_shingle([doc], shingle_size=3))[0]
+        for doc in documents
+    ]
+
+    assert together == alone
+
+
+def test_hashed_shingles_match_vocabulary_shingles(documents):
+    pairs = np.array([[0, 1], [0, 2], [1, 2], [3, 5], [4, 5]])
+
+    for vocabulary_shingle, hashed_shingle in (
+        (word_based_shingle, word_based_hashed_shingle),
+        (character_based_shingle, character_based_hashed_shingle),
+    ):
+        vocabulary = vocabulary_shingle(documents[:6], shingle_size=3, window_step=2)
+        # With 62-bit ids collisions are practically impossible, so the shingle sets are the same
+        hashed = hashed_shingle(
+            documents[:6], shingle_size=3, window_step=2, hash_bits=62
+        )
+
+        assert [len(ids) for ids in shingle_ids(hashed)] == [
+            len(ids) for ids in shingle_ids(vocabulary)
+        ]
+        np.testing.assert_allclose(
+            exact_jaccard(hashed, pairs), exact_jaccard(vocabulary, pairs)
+        )
+
+
+def test_window_step_skips_shingles():
+    document = " ".join(f"w{idx}" for idx in range(10))
+
+    for window_step, expected in ((1, 8), (2, 4), (3, 3)):
+        shingles = word_based_hashed_shingle(
+            [document], shingle_size=3, window_step=window_step
+        )
+        assert shingles.nnz == expected
+
+
+def test_short_documents_have_no_shingles():
+    shingles = word_based_hashed_shingle(["w1 w2", "", "w1 w2 w3"], shingle_size=3)
+
+    assert [len(ids) for ids in shingle_ids(shingles)] == [0, 0, 1]
@@ -0,0 +1,69 @@
+import numpy as np
+from src.LSH.hashing import Hashing
+from src.LSH.signature_store import SignatureStore
+
+
+def create_store(path, capacity=0):
+    return SignatureStore.create(
+        str(path),
+        Hashing(n_hash=12, n_bands=3),
+        shingle_size=3,
+        window_step=1,
+        word_based=True,
+        hashed_shingles=True,
+        capacity=capacity,
+    )
+
+
+def random_signatures(nr_docs, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 1 << 32, size=(12, nr_docs), dtype=np.uint32)
+
+
+def test_store_round_trip(tmp_path):
+    store = create_store(tmp_path)
+    chunks = [
+        random_signatures(nr_docs, seed)
+        for seed, nr_docs in enumerate((5, 0, 1, 17, 3))
+    ]
+    for chunk in chunks:
+        store.append(chunk)
+
+    opened = SignatureStore.open(str(tmp_path))
+
+    assert opened.num_documents == 26
+    assert opened.header["shingle_size"] == 3
+    np.testing.assert_array_equal(opened.signatures(), np.concatenate(chunks, axis=1))
+
+
+def test_full_store_is_contiguous(tmp_path):
+    signatures = random_signatures(20)
+    store = create_store(tmp_path, capacity=20)
+    store.append(signatures[:, :8])
+    store.append(signatures[:, 8:])
+
+    stored = store.signatures()
+
+    assert store.capacity == 20
+    # The rows of a band are stored next to each other
+    assert stored.flags.c_contiguous
+    np.testing.assert_array_equal(stored[4:8], signatures[4:8])
+
+
+def test_empty_store(tmp_path):
+    store = create_store(tmp_path)
+
+    assert store.signatures().shape == (12, 0)
+
+
+def test_truncate_reuses_the_room_of_dropped_documents(tmp_path):
+    signatures = random_signatures(10)
+    store = create_store(tmp_path)
+    store.append(signatures)
+
+    store.truncate(6)
+    store.append(signatures[:, :2])
+
+    reopened = SignatureStore.open(str(tmp_path)).signatures()
+    np.testing.assert_array_equal(reopened[:, :6], signatures[:, :6])
+    np.testing.assert_array_equal(reopened[:, 6:], signatures[:, :2])
@@ -0,0 +1,78 @@
+import itertools
+import numpy as np
+import pytest
+from src.LSH.hashing import Hashing
+from src.LSH.minhash import compute_signature_matrix
+from src.LSH.shingle import word_based_shingle
+from src.LSH.LSHModel import LSHModel
+from src.LSH.similarity import (
+    exact_jaccard,
+    estimated_jaccard,
+    verify_candidates,
+)
+
+
+@pytest.fixture
+def pairs():
+    return np.array(list(itertools.combinations(range(9), 2)), dtype=np.int64)
+
+
+def test_exact_jaccard_equals_set_similarity(documents, pairs):
+    shingles = word_based_shingle(documents, shingle_size=2)
+    sets = [set(zip(doc.split(), doc.split()[1:])) for doc in documents]
+
+    expected = [
+        len(sets[a] & sets[b]) / len(sets[a] | sets[b]) for a, b in pairs.tolist()
+    ]
+
+    np.testing.assert_allclose(exact_jaccard(shingles, pairs, batch_size=4), expected)
+
+
+def test_estimated_jaccard_is_close_to_exact(documents, pairs):
+    shingles = word_based_shingle(documents, shingle_size=2)
+    signatures = compute_signature_matrix(shingles, Hashing(n_hash=400, n_bands=4))
+
+    estimated = estimated_jaccard(signatures, pairs, batch_size=4)
+
+    np.testing.assert_allclose(estimated, exact_jaccard(shingles, pairs), atol=0.1)
+
+
+@pytest.mark.parametrize("method", ["exact", "estimated"])
+def test_verify_candidates_drops_dissimilar_pairs(documents, pairs, method):
+    shingles = word_based_shingle(documents, shingle_size=2)
+    signatures = compute_signature_matrix(shingles, Hashing(n_hash=200, n_bands=4))
+
+    records = verify_candidates(
+        pairs, 0.5, signatures=signatures, shingles=shingles, method=method
+    )
+
+    # Only the near-duplicates (every third document copies the one before it) remain
+    assert list(zip(records["doc_a"], records["doc_b"])) == [(1, 2), (4, 5), (7, 8)]
+    assert np.all(records["score"] >= 0.5)
+
+
+def test_verify_candidates_rejects_unknown_method(pairs):
+    with pytest.raises(ValueError):
+        verify_candidates(pairs, 0.5, method="unknown")
+
+
+def test_predict_with_scores_reports_the_near_duplicates(documents, file_paths):
+    model = LSHModel(
+        shingle_size=2,
+        window_step=1,
+        n_bands=25,
+        K=1000,
+        n_hash=50,
+        verification_threshold=0.5,
+        verification_method="exact",
+    )
+
+    records = model.predict_with_scores(documents, file_paths)
+
+    assert {(first, second) for first, second, _ in records} == {
+        (file_paths[idx - 1], file_paths[idx])
+        for idx in range(len(documents))
+        if idx % 3 == 2
+    }
+    scores = [score for _, _, score in records]
+    assert scores == sorted(scores, reverse=True) and min(scores) >= 0.5
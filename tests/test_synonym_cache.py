@@ -0,0 +1,60 @@
+import pytest
+from src.preprocessing import synonym_cache as synonym_cache_module
+from src.preprocessing.synonym_cache import SynonymCache
+
+
+@pytest.fixture
+def lookups(monkeypatch):
+    # Replace WordNet by a fixed dictionary and record which words are looked up
+    synonyms = {"big": ["huge", "large"], "quickly": ["fast"]}
+    looked_up = []
+
+    def get_synonyms(word):
+        looked_up.append(word)
+        return synonyms.get(word, [])
+
+    monkeypatch.setattr(synonym_cache_module, "get_synonyms", get_synonyms)
+    return looked_up
+
+
+def test_synonym_cache_looks_up_every_word_once(tmp_path, lookups):
+    cache = SynonymCache(cache_file=str(tmp_path / "synonyms.sqlite"))
+
+    assert cache.get("big") == ["huge", "large"]
+    assert cache.get("big") == ["huge", "large"]
+    # Words without synonyms are cached as well
+    assert cache.get("the") == []
+    assert cache.get("the") == []
+
+    assert lookups == ["big", "the"]
+
+
+def test_synonym_cache_flush_and_reload(tmp_path, lookups):
+    cache_file = str(tmp_path / "synonyms.sqlite")
+    cache = SynonymCache(cache_file=cache_file)
+    cache.get("big")
+    cache.get("the")
+    cache.flush()
+
+    reloaded = SynonymCache(cache_file=cache_file)
+
+    assert reloaded.get("big") == ["huge", "large"]
+    assert reloaded.get("the") == []
+    assert lookups == ["big", "the"]
+
+
+def test_synonym_cache_only_writes_on_flush(tmp_path, lookups):
+    cache_file = str(tmp_path / "synonyms.sqlite")
+    SynonymCache(cache_file=cache_file).get("quickly")
+
+    assert SynonymCache(cache_file=cache_file).get("quickly") == ["fast"]
+    assert lookups == ["quickly", "quickly"]
+
+
+def test_synonym_cache_without_file(lookups):
+    cache = SynonymCache(cache_file=None)
+
+    assert cache.get("big") == ["huge", "large"]
+    cache.flush()
+    assert cache.get("big") == ["huge", "large"]
+    assert lookups == ["big"]